@@ -0,0 +1,105 @@
+#-------------------------------------------------------------------------
+# Microsoft Developer & Platform Evangelism
+#
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# THIS CODE AND INFORMATION ARE PROVIDED "AS IS" WITHOUT WARRANTY OF ANY KIND,
+# EITHER EXPRESSED OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND/OR FITNESS FOR A PARTICULAR PURPOSE.
+#----------------------------------------------------------------------------------
+# The example companies, organizations, products, domain names,
+# e-mail addresses, logos, people, places, and events depicted
+# herein are fictitious. No association with any real company,
+# organization, product, domain name, email address, logo, person,
+# places, or events is intended or should be inferred.
+#--------------------------------------------------------------------------
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from concurrency_governor import governed_call
+from directory_walker import ShareTreeWalker
+
+# Outcome of one item of a bulk operation.
+# name - share name or path the operation was applied to
+# succeeded - True if the operation completed
+# error - the exception raised by the operation, or None
+BulkResult = namedtuple('BulkResult', ['name', 'succeeded', 'error'])
+
+#
+# Bulk creation and deletion of shares, directories and files.
+#
+# Every operation is applied to all items concurrently from a bounded thread pool and a
+# BulkResult is returned for each item, in input order, instead of stopping at the first
+# failure. Directories are handled one depth level at a time, parents before children on
+# creation and children before parents on deletion, with each level run in parallel.
+# With a ConcurrencyGovernor, throttled requests are retried and the number of requests in
+# flight adapts to throttling, up to max_workers.
+#
+class BulkOperations():
+
+    # Input Arguments:
+    # max_workers - number of items processed concurrently
+    # governor - ConcurrencyGovernor limiting the requests in flight, possibly shared with other operations
+    def __init__(self, max_workers=16, governor=None):
+        if max_workers < 1:
+            raise ValueError('max_workers must be at least 1.')
+        self.max_workers = max_workers
+        self.governor = governor
+
+    def create_shares(self, service, share_names, **kwargs):
+        return self._run(lambda name: service.create_share(share_name=name, **kwargs), share_names)
+
+    def delete_shares(self, service, share_names):
+        return self._run(lambda name: service.delete_share(name), share_names)
+
+    def create_directories(self, share_client, directory_paths):
+        return self._run_by_level(lambda path: share_client.create_directory(path), directory_paths, reverse=False)
+
+    def delete_directories(self, share_client, directory_paths):
+        return self._run_by_level(lambda path: share_client.delete_directory(path), directory_paths, reverse=True)
+
+    # Creates files of the given size; their content is left as zeros.
+    def create_files(self, share_client, file_paths, size=0):
+        return self._run(lambda path: share_client.get_file_client(path).create_file(size), file_paths)
+
+    def delete_files(self, share_client, file_paths):
+        return self._run(lambda path: share_client.get_file_client(path).delete_file(), file_paths)
+
+    # Deletes everything under directory_path, and the directory itself unless it is the share root.
+    # All files are deleted in parallel first, then directories bottom-up, one level at a time.
+    def delete_tree(self, share_client, directory_path=''):
+        directory_path = directory_path.strip('/')
+        file_paths = []
+        directory_paths = [directory_path] if directory_path else []
+        walker = ShareTreeWalker(max_workers=self.max_workers, governor=self.governor)
+        for entry in walker.walk(share_client, directory_path):
+            if entry['is_directory']:
+                directory_paths.append(entry['path'])
+            else:
+                file_paths.append(entry['path'])
+
+        return self.delete_files(share_client, file_paths) + self.delete_directories(share_client, directory_paths)
+
+    # Runs operation over the paths one depth level at a time, shallowest first unless reverse is set.
+    def _run_by_level(self, operation, paths, reverse):
+        levels = {}
+        for path in paths:
+            levels.setdefault(path.strip('/').count('/'), []).append(path)
+
+        results = {}
+        for level in sorted(levels, reverse=reverse):
+            for result in self._run(operation, levels[level]):
+                results[result.name] = result
+        return [results[path] for path in paths]
+
+    def _run(self, operation, names):
+        def apply(name):
+            try:
+                governed_call(self.governor, operation, name)
+                return BulkResult(name, True, None)
+            except Exception as e:
+                return BulkResult(name, False, e)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(apply, names))
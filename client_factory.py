@@ -0,0 +1,110 @@
+#-------------------------------------------------------------------------
+# Microsoft Developer & Platform Evangelism
+#
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# THIS CODE AND INFORMATION ARE PROVIDED "AS IS" WITHOUT WARRANTY OF ANY KIND,
+# EITHER EXPRESSED OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND/OR FITNESS FOR A PARTICULAR PURPOSE.
+#----------------------------------------------------------------------------------
+# The example companies, organizations, products, domain names,
+# e-mail addresses, logos, people, places, and events depicted
+# herein are fictitious. No association with any real company,
+# organization, product, domain name, email address, logo, person,
+# places, or events is intended or should be inferred.
+#--------------------------------------------------------------------------
+
+import threading
+from collections import OrderedDict
+
+import config
+from instrumentation import instrument_if_enabled
+
+#
+# Process-wide factory for Azure Files clients.
+#
+# The connection string is parsed once into a ShareServiceClient whose HTTP transport is a
+# single requests session with a connection pool of configurable size. Share, directory and
+# file clients are derived from that service client, so they all reuse the same pool and
+# the connections opened by earlier requests, and are kept in an LRU cache keyed by path.
+# When profiling is enabled (see instrumentation.py) the clients handed out are instrumented.
+#
+# requests and the SDK are imported when the first factory is created rather than with this
+# module, so commands that never build a client do not pay for loading them.
+#
+class ShareClientFactory():
+
+    # Input Arguments:
+    # connection_string - storage account connection string
+    # connection_pool_size - maximum number of connections kept open to the account
+    # max_cached_clients - number of share, directory and file clients kept in the LRU cache
+    def __init__(self, connection_string, connection_pool_size=32, max_cached_clients=1024):
+        import requests
+        from azure.core.pipeline.transport import RequestsTransport
+        from azure.storage.fileshare import ShareServiceClient
+
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=connection_pool_size, pool_maxsize=connection_pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        self.transport = RequestsTransport(session=session, session_owner=False)
+
+        self.service = ShareServiceClient.from_connection_string(conn_str=connection_string, transport=self.transport)
+        self.max_cached_clients = max_cached_clients
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_service_client(self):
+        return instrument_if_enabled(self.service)
+
+    def get_share_client(self, share_name):
+        return self._get_cached(('share', share_name), lambda: self.service.get_share_client(share_name))
+
+    def get_directory_client(self, share_name, directory_path):
+        directory_path = directory_path.strip('/')
+        return self._get_cached(('directory', share_name, directory_path),
+                                lambda: self.get_share_client(share_name).get_directory_client(directory_path))
+
+    def get_file_client(self, share_name, file_path):
+        file_path = file_path.strip('/')
+        return self._get_cached(('file', share_name, file_path),
+                                lambda: self.get_share_client(share_name).get_file_client(file_path))
+
+    def _get_cached(self, key, create):
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+                return instrument_if_enabled(client)
+
+        # Built outside the lock; get_directory_client and get_file_client look up the share client first
+        client = create()
+        with self._lock:
+            client = self._clients.setdefault(key, client)
+            self._clients.move_to_end(key)
+            while len(self._clients) > self.max_cached_clients:
+                self._clients.popitem(last=False)
+        return instrument_if_enabled(client)
+
+
+_factories = {}
+_factories_lock = threading.Lock()
+
+
+# Returns the process-wide ShareClientFactory for connection_string, creating it on first use.
+# Defaults to config.STORAGE_CONNECTION_STRING; the keyword arguments only apply on creation.
+# The connection pool is sized by the active transfer profile unless connection_pool_size is given.
+def get_client_factory(connection_string=None, **kwargs):
+    if connection_string is None:
+        connection_string = config.STORAGE_CONNECTION_STRING
+    if 'connection_pool_size' not in kwargs:
+        # Imported here as it loads the transfer machinery, which importing this module does not need
+        from transfer_profiles import get_active_profile
+        kwargs['connection_pool_size'] = get_active_profile().connection_pool_size
+
+    with _factories_lock:
+        factory = _factories.get(connection_string)
+        if factory is None:
+            factory = ShareClientFactory(connection_string, **kwargs)
+            _factories[connection_string] = factory
+        return factory
@@ -0,0 +1,182 @@
+#-------------------------------------------------------------------------
+# Microsoft Developer & Platform Evangelism
+#
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# THIS CODE AND INFORMATION ARE PROVIDED "AS IS" WITHOUT WARRANTY OF ANY KIND,
+# EITHER EXPRESSED OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND/OR FITNESS FOR A PARTICULAR PURPOSE.
+#----------------------------------------------------------------------------------
+# The example companies, organizations, products, domain names,
+# e-mail addresses, logos, people, places, and events depicted
+# herein are fictitious. No association with any real company,
+# organization, product, domain name, email address, logo, person,
+# places, or events is intended or should be inferred.
+#--------------------------------------------------------------------------
+
+import random
+import threading
+import time
+
+# HTTP status codes with which the service rejects requests over its rate
+THROTTLE_STATUS_CODES = frozenset([429, 503])
+
+# Error codes of throttling responses
+THROTTLE_ERROR_CODES = frozenset(['ServerBusy'])
+
+# Exception classes of azure.core raised when a request could not be sent or its response not
+# read, matched by name so that the SDK is not imported
+CONNECTION_ERROR_NAMES = frozenset(['ServiceRequestError', 'ServiceResponseError'])
+
+
+# Returns True if error is a throttling response of the service rather than a real failure.
+def is_throttled(error):
+    return (getattr(error, 'status_code', None) in THROTTLE_STATUS_CODES
+            or getattr(error, 'error_code', None) in THROTTLE_ERROR_CODES)
+
+
+# Returns True if error may go away when the request is repeated: throttling, a 5xx status or
+# a connection failure. Client errors, and ThrottledError once the governor has given up, are not.
+def is_transient(error):
+    if isinstance(error, ThrottledError):
+        return False
+    if is_throttled(error) or (getattr(error, 'status_code', None) or 0) >= 500:
+        return True
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    return any(cls.__name__ in CONNECTION_ERROR_NAMES for cls in type(error).__mro__)
+
+
+# Runs operation through governor, or directly if governor is None.
+def governed_call(governor, operation, *args, **kwargs):
+    if governor is None:
+        return operation(*args, **kwargs)
+    return governor.call(operation, *args, **kwargs)
+
+
+# Raised by ConcurrencyGovernor.call when a request is still throttled after max_retries retries.
+class ThrottledError(Exception):
+
+    def __init__(self, error, attempts):
+        super(ThrottledError, self).__init__('Request throttled ' + str(attempts) + ' times: ' + str(error))
+        self.error = error
+        self.attempts = attempts
+
+
+#
+# Adaptive limit on the number of requests in flight to one storage account, shared by
+# every bulk path that sends requests to it.
+#
+# The limit follows AIMD, as TCP congestion control does: every request completed without
+# throttling raises it by increase / limit, so it grows by about increase per round of
+# requests, and a throttling response, or a latency above latency_target when one is set,
+# multiplies it by decrease_factor. Requests started before the last decrease do not
+# decrease it again, so a burst of throttled responses counts as one congestion signal.
+#
+# A throttled request is retried after a backoff with full jitter, a random wait between
+# zero and backoff_base * 2 ** (attempt - 1) seconds, so the retries of concurrent requests do
+# not arrive together. Other errors are raised to the caller at once.
+#
+# The SDK retry policy also retries throttled requests on its own, which the governor sees
+# as slower requests; a latency_target makes it back off on those as well.
+#
+class ConcurrencyGovernor():
+
+    # Input Arguments:
+    # initial_limit - number of requests allowed in flight at the start
+    # min_limit, max_limit - bounds of the limit
+    # increase - amount added to the limit per round of successful requests
+    # decrease_factor - factor the limit is multiplied by on throttling
+    # latency_target - seconds above which a successful request counts as congestion, None to ignore latency
+    # max_retries - number of times a throttled request is retried before ThrottledError is raised
+    # backoff_base - wait in seconds bounding the first jittered backoff, doubled on every attempt
+    # backoff_max - longest backoff in seconds
+    # rng - random.Random used for the jitter, replaceable for testing
+    def __init__(self, initial_limit=8, min_limit=1, max_limit=64, increase=1.0, decrease_factor=0.5,
+                 latency_target=None, max_retries=8, backoff_base=0.1, backoff_max=10.0, rng=None):
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError('limits must satisfy 1 <= min_limit <= initial_limit <= max_limit.')
+        if not 0 < decrease_factor < 1:
+            raise ValueError('decrease_factor must be between 0 and 1.')
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.latency_target = latency_target
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rng = rng or random.Random()
+        self.limit = float(initial_limit)
+        self.in_flight = 0
+        self._condition = threading.Condition()
+        self._last_decrease = float('-inf')
+        self.requests = 0
+        self.throttled = 0
+        self.retries = 0
+        self.decreases = 0
+
+    # Runs operation(*args, **kwargs) once the limit allows it, retrying it while it is throttled.
+    def call(self, operation, *args, **kwargs):
+        attempt = 0
+        while True:
+            started = self.acquire()
+            try:
+                result = operation(*args, **kwargs)
+            except Exception as e:
+                throttled = is_throttled(e)
+                self.release(started, throttled=throttled, failed=not throttled)
+                if not throttled:
+                    raise
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise ThrottledError(e, attempt)
+                with self._condition:
+                    self.retries += 1
+                time.sleep(self.backoff(attempt))
+                continue
+            self.release(started)
+            return result
+
+    # Waits for a free slot and returns the time the request started, to be passed to release.
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+            return time.monotonic()
+
+    # Frees the slot of a request started at started and adjusts the limit with its outcome.
+    # A request that failed for another reason than throttling leaves the limit unchanged.
+    def release(self, started, throttled=False, failed=False):
+        now = time.monotonic()
+        with self._condition:
+            self.in_flight -= 1
+            self.requests += 1
+            if throttled:
+                self.throttled += 1
+            congested = throttled or (not failed and self.latency_target is not None and now - started > self.latency_target)
+            if congested:
+                if started >= self._last_decrease:
+                    self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                    self._last_decrease = now
+                    self.decreases += 1
+            elif not failed:
+                self.limit = min(self.max_limit, self.limit + self.increase / self.limit)
+            self._condition.notify_all()
+
+    # Returns the jittered wait in seconds before retry number attempt.
+    def backoff(self, attempt):
+        return self.rng.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1))))
+
+    # Returns the current limit and counters as a dict.
+    def stats(self):
+        with self._condition:
+            return {
+                'limit': round(self.limit, 2),
+                'in_flight': self.in_flight,
+                'requests': self.requests,
+                'throttled': self.throttled,
+                'retries': self.retries,
+                'decreases': self.decreases,
+            }
@@ -16,4 +16,9 @@
 # Please do not include this file if you plan to contribute to this repo to assure your storage account name and key are not inadvertantly shared
 #--------------------------------------------------------------------------
 
-STORAGE_CONNECTION_STRING = ''
\ No newline at end of file
+STORAGE_CONNECTION_STRING = ''
+
+# Transfer profile used by the samples: default, small-files, large-files, low-memory, or one
+# written by "python transfer_profiles.py autotune" to TRANSFER_PROFILE_FILE (see transfer_profiles.py)
+TRANSFER_PROFILE = 'default'
+TRANSFER_PROFILE_FILE = ''
@@ -0,0 +1,351 @@
+#-------------------------------------------------------------------------
+# Microsoft Developer & Platform Evangelism
+#
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# THIS CODE AND INFORMATION ARE PROVIDED "AS IS" WITHOUT WARRANTY OF ANY KIND,
+# EITHER EXPRESSED OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND/OR FITNESS FOR A PARTICULAR PURPOSE.
+#----------------------------------------------------------------------------------
+# The example companies, organizations, products, domain names,
+# e-mail addresses, logos, people, places, and events depicted
+# herein are fictitious. No association with any real company,
+# organization, product, domain name, email address, logo, person,
+# places, or events is intended or should be inferred.
+#--------------------------------------------------------------------------
+
+import heapq
+import itertools
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from bulk_operations import BulkOperations
+from directory_walker import ShareTreeWalker
+from file_transfer import MAX_RANGE_SIZE, split_ranges
+
+# Outcome of one copy.
+# source, destination - urls of the copied files
+# status - 'success', 'failed', or 'aborted' if the copy was cancelled
+# method - 'server' for a server-side copy, 'client' if it was finished by the ranged fallback
+# attempts - number of server-side copies started for the file
+# error - the last exception or reason of a failure, or None
+CopyResult = namedtuple('CopyResult', ['source', 'destination', 'status', 'method', 'attempts', 'error'])
+
+#
+# Orchestrates many server-side file copies at once.
+#
+# Up to max_in_flight copies are in progress at a time; each is started with
+# start_copy_from_url and left running on the service. A single scheduler loop keeps a
+# queue of the copies ordered by when their status is next due and hands the start, poll
+# and abort requests to a thread pool, so hundreds of copies are tracked without a thread
+# each. The wait before the next poll of a copy adapts
+# to it: it is half the time the copy is estimated to need at its current rate, between
+# poll_interval and max_poll_interval, and it doubles while no progress is reported.
+#
+# A copy that fails on the service is restarted up to max_retries times. A copy that reports
+# no progress for stall_timeout seconds is aborted. Both are then finished by a client-side
+# ranged copy, which downloads the valid ranges of the source and uploads them to the
+# destination, unless fallback is disabled. cancel() aborts every copy still pending.
+#
+# Source files in the same storage account as the destination are authorized with the
+# credentials of the destination client; other sources need a url carrying a SAS token.
+#
+class CopyManager():
+
+    # Input Arguments:
+    # max_in_flight - number of copies in progress at the same time, on the service or by the fallback
+    # max_workers - number of threads issuing start, poll, abort and fallback requests
+    # poll_interval - wait in seconds before the first status poll of a copy, and the shortest one
+    # max_poll_interval - longest wait in seconds between two polls of the same copy
+    # stall_timeout - seconds without progress after which a pending copy is aborted
+    # max_retries - number of times a failed copy or range request is retried
+    # fallback - whether a stalled or failed copy is finished with a client-side ranged copy
+    # chunk_size - size of each range transferred by the client-side copy, at most MAX_RANGE_SIZE
+    # clock - function returning the current time in seconds, replaceable for testing
+    def __init__(self, max_in_flight=100, max_workers=16, poll_interval=0.5, max_poll_interval=30.0,
+                 stall_timeout=300.0, max_retries=2, fallback=True, chunk_size=MAX_RANGE_SIZE, clock=time.monotonic):
+        if max_in_flight < 1:
+            raise ValueError('max_in_flight must be at least 1.')
+        if max_workers < 1:
+            raise ValueError('max_workers must be at least 1.')
+        if chunk_size <= 0 or chunk_size > MAX_RANGE_SIZE:
+            raise ValueError('chunk_size must be between 1 and ' + str(MAX_RANGE_SIZE) + ' bytes.')
+        self.max_in_flight = max_in_flight
+        self.max_workers = max_workers
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.stall_timeout = stall_timeout
+        self.max_retries = max_retries
+        self.fallback = fallback
+        self.chunk_size = chunk_size
+        self.clock = clock
+        self._cancelled = threading.Event()
+
+    # Copies every (source_client, destination_client) pair and returns a CopyResult for each,
+    # in input order.
+    def copy_files(self, pairs):
+        self._cancelled.clear()
+        return _CopyRun(self, pairs).run()
+
+    # Copies every file under directory_path of source_share to the same path in destination_share,
+    # creating the directories first, and returns a CopyResult for each file.
+    def copy_share(self, source_share, destination_share, directory_path=''):
+        directory_path = directory_path.strip('/')
+        directory_paths = [directory_path] if directory_path else []
+        file_paths = []
+        for entry in ShareTreeWalker(max_workers=self.max_workers).walk(source_share, directory_path):
+            if entry['is_directory']:
+                directory_paths.append(entry['path'])
+            else:
+                file_paths.append(entry['path'])
+
+        # Directories that already exist fail to be created, which is fine; a copy into a
+        # directory that could not be created fails and is reported in its CopyResult
+        BulkOperations(max_workers=self.max_workers).create_directories(destination_share, directory_paths)
+        return self.copy_files((source_share.get_file_client(path), destination_share.get_file_client(path))
+                               for path in file_paths)
+
+    # Stops starting copies and aborts the pending ones. Can be called from any thread.
+    def cancel(self):
+        self._cancelled.set()
+
+    # Finishes a copy on the client: the file is recreated at the size and with the metadata of
+    # the source, then the valid ranges of the source are downloaded and uploaded in chunks.
+    def _client_copy(self, source, destination):
+        properties = source.get_file_properties()
+        destination.create_file(properties['size'], metadata=properties['metadata'])
+        for valid_range in source.get_ranges():
+            start = valid_range['start']
+            # The service reports inclusive end offsets
+            for offset, length in split_ranges(valid_range['end'] + 1 - start, self.chunk_size):
+                self._copy_range(source, destination, start + offset, length)
+
+    def _copy_range(self, source, destination, offset, length):
+        attempt = 0
+        while True:
+            try:
+                data = source.download_file(offset=offset, length=length).readall()
+                destination.upload_range(data=data, offset=offset, length=length)
+                return
+            except Exception:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                time.sleep(self.poll_interval * (2 ** (attempt - 1)))
+
+
+# State of one copy, only changed by the scheduler loop.
+class _CopyJob():
+
+    def __init__(self, index, source, destination):
+        self.index = index
+        self.source = source
+        self.destination = destination
+        self.started = False
+        self.attempts = 0
+        self.copy_id = None
+        self.error = None
+        # Progress reported by the last poll, when it last grew, and the current poll wait
+        self.copied = 0
+        self.total = 0
+        self.progress_time = None
+        self.interval = None
+        self.result = None
+
+
+# One run of CopyManager.copy_files.
+#
+# Requests are executed by the pool and their outcome is handled by the loop in run(), which
+# decides the next action of the copy and when it is due.
+class _CopyRun():
+
+    def __init__(self, manager, pairs):
+        self.manager = manager
+        self.jobs = [_CopyJob(index, source, destination) for index, (source, destination) in enumerate(pairs)]
+        self.waiting = deque(self.jobs)
+        # Heap of (due time, sequence, job, action)
+        self.scheduled = []
+        self.running = {}
+        self.in_flight = 0
+        self._sequence = itertools.count()
+
+    def run(self):
+        manager = self.manager
+        try:
+            with ThreadPoolExecutor(max_workers=manager.max_workers) as executor:
+                while self.waiting or self.scheduled or self.running:
+                    now = manager.clock()
+                    if manager._cancelled.is_set():
+                        self._cancel_waiting()
+                    while self.waiting and self.in_flight < manager.max_in_flight:
+                        job = self.waiting.popleft()
+                        job.started = True
+                        self.in_flight += 1
+                        self._schedule(job, 'start', 0)
+
+                    while self.scheduled and self.scheduled[0][0] <= now:
+                        _, _, job, action = heapq.heappop(self.scheduled)
+                        self.running[executor.submit(getattr(self, '_' + action), job)] = (job, action)
+
+                    timeout = max(0.0, self.scheduled[0][0] - now) if self.scheduled else None
+                    if not self.running:
+                        manager._cancelled.wait(timeout)
+                        continue
+                    done, _ = wait(self.running, timeout=timeout, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        job, action = self.running.pop(future)
+                        getattr(self, '_on_' + action)(job, future)
+        except BaseException:
+            # Interrupted: do not leave copies running on the service
+            for job in self.jobs:
+                if job.result is None and job.copy_id is not None:
+                    try:
+                        self._abort(job)
+                    except Exception:
+                        pass
+            raise
+        return [job.result for job in self.jobs]
+
+    def _schedule(self, job, action, delay):
+        heapq.heappush(self.scheduled, (self.manager.clock() + delay, next(self._sequence), job, action))
+
+    def _cancel_waiting(self):
+        while self.waiting:
+            self._finish(self.waiting.popleft(), 'aborted', 'server', 'cancelled')
+        # Retries of failed starts and pending fallbacks are dropped, pending copies are aborted
+        scheduled, self.scheduled = self.scheduled, []
+        for item in scheduled:
+            job, action = item[2], item[3]
+            if action == 'abort':
+                heapq.heappush(self.scheduled, item)
+            elif action == 'poll':
+                self._schedule(job, 'abort', 0)
+            else:
+                self._finish(job, 'aborted', 'server', 'cancelled')
+
+    def _finish(self, job, status, method, error=None):
+        if job.started:
+            self.in_flight -= 1
+        job.copy_id = None
+        job.result = CopyResult(job.source.url, job.destination.url, status, method, job.attempts, error)
+
+    # Requests, run on the pool
+
+    def _start(self, job):
+        return job.destination.start_copy_from_url(job.source.url)
+
+    def _poll(self, job):
+        return job.destination.get_file_properties()['copy']
+
+    def _abort(self, job):
+        job.destination.abort_copy(job.copy_id)
+
+    def _fallback(self, job):
+        self.manager._client_copy(job.source, job.destination)
+
+    # Outcomes, handled by the scheduler loop
+
+    def _on_start(self, job, future):
+        manager = self.manager
+        job.attempts += 1
+        try:
+            response = future.result()
+        except Exception as e:
+            self._server_failed(job, e)
+            return
+
+        job.copy_id = response['copy_id']
+        if manager._cancelled.is_set() and response['copy_status'] == 'pending':
+            self._schedule(job, 'abort', 0)
+        elif response['copy_status'] == 'pending':
+            job.copied = 0
+            job.progress_time = manager.clock()
+            job.interval = manager.poll_interval
+            self._schedule(job, 'poll', job.interval)
+        else:
+            self._on_status(job, response['copy_status'], None)
+
+    def _on_poll(self, job, future):
+        manager = self.manager
+        now = manager.clock()
+        try:
+            copy = future.result()
+        except Exception as e:
+            # A failed poll counts as no progress, so a copy that cannot be polled ends up stalled
+            job.error = e
+            copy = {'status': 'pending', 'progress': None}
+
+        if copy['status'] != 'pending':
+            self._on_status(job, copy['status'], copy.get('status_description'))
+            return
+
+        copied, total = _parse_progress(copy['progress'])
+        if copied > job.copied:
+            rate = (copied - job.copied) / max(now - job.progress_time, 1e-6)
+            job.copied = copied
+            job.total = total
+            job.progress_time = now
+            job.interval = min(max((total - copied) / rate / 2, manager.poll_interval), manager.max_poll_interval)
+        else:
+            job.interval = min(job.interval * 2, manager.max_poll_interval)
+
+        if manager._cancelled.is_set():
+            self._schedule(job, 'abort', 0)
+        elif now - job.progress_time >= manager.stall_timeout:
+            job.error = 'copy stalled at ' + str(job.copied) + ' of ' + str(job.total) + ' bytes'
+            self._schedule(job, 'abort', 0)
+        else:
+            self._schedule(job, 'poll', job.interval)
+
+    def _on_abort(self, job, future):
+        try:
+            future.result()
+        except Exception:
+            # The copy may have completed or failed since the last poll; the fallback overwrites it either way
+            pass
+        if self.manager._cancelled.is_set():
+            self._finish(job, 'aborted', 'server', 'cancelled')
+        else:
+            self._give_up_server_copy(job)
+
+    def _on_fallback(self, job, future):
+        try:
+            future.result()
+            self._finish(job, 'success', 'client', job.error)
+        except Exception as e:
+            self._finish(job, 'failed', 'client', e)
+
+    def _on_status(self, job, status, description):
+        if status == 'success':
+            self._finish(job, 'success', 'server')
+        else:
+            self._server_failed(job, description or 'copy ' + str(status))
+
+    # Restarts a failed server-side copy after a backoff, or falls back once out of retries.
+    def _server_failed(self, job, error):
+        manager = self.manager
+        job.error = error
+        job.copy_id = None
+        if manager._cancelled.is_set():
+            self._finish(job, 'aborted', 'server', 'cancelled')
+        elif job.attempts <= manager.max_retries:
+            self._schedule(job, 'start', manager.poll_interval * (2 ** (job.attempts - 1)))
+        else:
+            self._give_up_server_copy(job)
+
+    def _give_up_server_copy(self, job):
+        job.copy_id = None
+        if self.manager.fallback:
+            self._schedule(job, 'fallback', 0)
+        else:
+            self._finish(job, 'failed', 'server', job.error)
+
+
+# Parses the 'bytes copied/total bytes' progress of a pending copy.
+def _parse_progress(progress):
+    if not progress:
+        return 0, 0
+    copied, _, total = progress.partition('/')
+    return int(copied), int(total)
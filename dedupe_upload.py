@@ -0,0 +1,226 @@
+#-------------------------------------------------------------------------
+# Microsoft Developer & Platform Evangelism
+#
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# THIS CODE AND INFORMATION ARE PROVIDED "AS IS" WITHOUT WARRANTY OF ANY KIND,
+# EITHER EXPRESSED OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND/OR FITNESS FOR A PARTICULAR PURPOSE.
+#----------------------------------------------------------------------------------
+# The example companies, organizations, products, domain names,
+# e-mail addresses, logos, people, places, and events depicted
+# herein are fictitious. No association with any real company,
+# organization, product, domain name, email address, logo, person,
+# places, or events is intended or should be inferred.
+#--------------------------------------------------------------------------
+
+import hashlib
+import os
+import sqlite3
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from copy_manager import CopyManager
+from transfer_profiles import create_uploader
+
+# Metadata entry holding the content hash of a deduplicated file, as '<algorithm>:<hex digest>'
+HASH_METADATA_KEY = 'content_hash'
+
+# Size of the blocks read while hashing a local file
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# Outcome of one deduplicated upload.
+# url - url of the destination file
+# content_hash - hash of the content as stored in the file metadata
+# size - size of the file in bytes
+# method - 'upload' if the bytes were sent, 'copy' for a server-side copy, 'unchanged' if the destination already held them
+# source - url the content was copied from, or None
+# bytes_saved - bytes that did not have to be uploaded
+# error - the exception raised if the file could not be stored, or None
+DedupeResult = namedtuple('DedupeResult', ['url', 'content_hash', 'size', 'method', 'source', 'bytes_saved', 'error'])
+
+# Copy source known only by url, which is all CopyManager needs without its ranged fallback
+_UrlSource = namedtuple('_UrlSource', ['url'])
+
+
+# Returns the '<algorithm>:<hex digest>' content hash of the local file at path, read in blocks.
+def hash_file(path, hash_name='sha256'):
+    digest = hashlib.new(hash_name)
+    block = bytearray(HASH_BLOCK_SIZE)
+    view = memoryview(block)
+    with open(path, 'rb') as local_file:
+        while True:
+            read = local_file.readinto(block)
+            if not read:
+                break
+            digest.update(view[:read])
+    return hash_name + ':' + digest.hexdigest()
+
+
+#
+# SQLite index from content hash to the remote files known to hold that content.
+#
+class ContentIndex():
+
+    def __init__(self, path):
+        self._connection = sqlite3.connect(path)
+        self._connection.execute('CREATE TABLE IF NOT EXISTS content (url TEXT PRIMARY KEY, content_hash TEXT NOT NULL, size INTEGER NOT NULL)')
+        self._connection.execute('CREATE INDEX IF NOT EXISTS content_by_hash ON content (content_hash, size)')
+        self._connection.commit()
+
+    # Returns the urls of the files recorded with this content.
+    def lookup(self, content_hash, size):
+        rows = self._connection.execute('SELECT url FROM content WHERE content_hash = ? AND size = ?', (content_hash, size))
+        return [row[0] for row in rows]
+
+    def record(self, url, content_hash, size):
+        self._connection.execute('INSERT OR REPLACE INTO content (url, content_hash, size) VALUES (?, ?, ?)', (url, content_hash, size))
+
+    def forget(self, url):
+        self._connection.execute('DELETE FROM content WHERE url = ?', (url,))
+
+    def commit(self):
+        self._connection.commit()
+
+    def close(self):
+        self._connection.commit()
+        self._connection.close()
+
+
+#
+# Upload mode that sends each distinct content once.
+#
+# Every local file is hashed with a streaming hashlib digest, which OpenSSL computes with the
+# SHA or MD5 instructions of the CPU where it has them, and the hash is stored in the metadata
+# of the uploaded file. A local ContentIndex maps hashes to the remote files holding them.
+# When a file to upload has a hash already in the index, or shared with another file of the
+# same batch, the destination is filled with a server-side copy of a file holding it instead
+# of uploading the bytes again.
+#
+# The index can be stale, as its files may have been rewritten by others since. A copy from
+# a file taken from the index is therefore checked against the hash in the destination's
+# copied metadata, and the file is uploaded if it does not match or the copy fails.
+#
+class DedupeUploader():
+
+    # Input Arguments:
+    # index_path - SQLite file holding the content index
+    # hash_name - hashlib algorithm of the content hash
+    # uploader - ParallelFileUploader sending the files that are not deduplicated, built from the active transfer profile by default
+    # copy_manager - CopyManager running the server-side copies
+    # max_workers - number of local files hashed, and of files uploaded, concurrently
+    def __init__(self, index_path, hash_name='sha256', uploader=None, copy_manager=None, max_workers=4):
+        self.index = ContentIndex(index_path)
+        self.hash_name = hash_name
+        self.uploader = uploader or create_uploader()
+        # A copy that fails is uploaded from the local file rather than copied range by range
+        self.copy_manager = copy_manager or CopyManager(fallback=False)
+        self.max_workers = max_workers
+
+    def upload(self, file_client, source_path):
+        return self.upload_files([(file_client, source_path)])[0]
+
+    # Stores every (file_client, source_path) pair and returns a DedupeResult for each, in input order.
+    def upload_files(self, pairs):
+        pairs = list(pairs)
+        sizes = [os.path.getsize(source_path) for _, source_path in pairs]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            hashes = list(executor.map(lambda pair: hash_file(pair[1], self.hash_name), pairs))
+        results = [None] * len(pairs)
+
+        # Files are grouped by content; each group needs one remote file holding it, the source
+        # of the copies to the others. A source taken from the index is checked after copying.
+        groups = {}
+        for index, key in enumerate(zip(hashes, sizes)):
+            groups.setdefault(key, []).append(index)
+        sources = {}
+        uploads = []
+        copies = []
+        for key, indexes in groups.items():
+            destinations = set(pairs[index][0].url for index in indexes)
+            known = self.index.lookup(*key)
+            for index in list(indexes):
+                file_client = pairs[index][0]
+                if file_client.url in known and self._holds(file_client, *key):
+                    results[index] = DedupeResult(file_client.url, key[0], key[1], 'unchanged', None, key[1], None)
+                    sources[key] = (file_client.url, False)
+                    indexes.remove(index)
+            if not indexes:
+                continue
+            if key not in sources:
+                # Indexed files among the destinations of the group do not hold the content anymore
+                known = [url for url in known if url not in destinations]
+                if known:
+                    sources[key] = (known[0], True)
+                else:
+                    uploads.append(indexes.pop(0))
+            copies.extend(indexes)
+
+        self._upload_all(pairs, hashes, sizes, uploads, results, sources)
+        # Copies of a group whose upload failed are uploaded as well
+        self._upload_all(pairs, hashes, sizes, [index for index in copies if (hashes[index], sizes[index]) not in sources],
+                         results, sources)
+        self._copy_all(pairs, hashes, sizes, [index for index in copies if results[index] is None], results, sources)
+        self.index.commit()
+        return results
+
+    # Returns the totals of a list of results as a dict.
+    @staticmethod
+    def summarize(results):
+        summary = {'files': len(results), 'upload': 0, 'copy': 0, 'unchanged': 0, 'failed': 0, 'bytes_saved': 0}
+        for result in results:
+            summary['failed' if result.error is not None else result.method] += 1
+            summary['bytes_saved'] += result.bytes_saved
+        return summary
+
+    def close(self):
+        self.index.close()
+
+    def _upload_all(self, pairs, hashes, sizes, indexes, results, sources):
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            outcomes = list(executor.map(lambda index: self._upload(pairs[index], hashes[index]), indexes))
+        for index, error in zip(indexes, outcomes):
+            url = pairs[index][0].url
+            results[index] = DedupeResult(url, hashes[index], sizes[index], 'upload', None, 0, error)
+            if error is None:
+                self.index.record(url, hashes[index], sizes[index])
+                sources.setdefault((hashes[index], sizes[index]), (url, False))
+            else:
+                self.index.forget(url)
+
+    def _copy_all(self, pairs, hashes, sizes, indexes, results, sources):
+        if not indexes:
+            return
+        copy_results = self.copy_manager.copy_files(
+            (_UrlSource(sources[(hashes[index], sizes[index])][0]), pairs[index][0]) for index in indexes)
+
+        failed = []
+        for index, copy_result in zip(indexes, copy_results):
+            file_client = pairs[index][0]
+            key = (hashes[index], sizes[index])
+            source_url, check = sources[key]
+            if copy_result.status == 'success' and (not check or self._holds(file_client, *key)):
+                self.index.record(file_client.url, *key)
+                results[index] = DedupeResult(file_client.url, key[0], key[1], 'copy', source_url, key[1], None)
+            else:
+                if check:
+                    self.index.forget(source_url)
+                failed.append(index)
+        self._upload_all(pairs, hashes, sizes, failed, results, {})
+
+    # Uploads the local file with its content hash in the metadata; returns the error raised, or None.
+    def _upload(self, pair, content_hash):
+        file_client, source_path = pair
+        try:
+            self.uploader.upload(file_client, source_path, metadata={HASH_METADATA_KEY: content_hash})
+        except Exception as e:
+            return e
+        return None
+
+    # Returns True if the remote file has the given size and content hash in its metadata.
+    def _holds(self, file_client, content_hash, size):
+        try:
+            properties = file_client.get_file_properties()
+        except Exception:
+            return False
+        return properties['size'] == size and (properties['metadata'] or {}).get(HASH_METADATA_KEY) == content_hash
@@ -0,0 +1,151 @@
+#-------------------------------------------------------------------------
+# Microsoft Developer & Platform Evangelism
+#
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# THIS CODE AND INFORMATION ARE PROVIDED "AS IS" WITHOUT WARRANTY OF ANY KIND,
+# EITHER EXPRESSED OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND/OR FITNESS FOR A PARTICULAR PURPOSE.
+#----------------------------------------------------------------------------------
+# The example companies, organizations, products, domain names,
+# e-mail addresses, logos, people, places, and events depicted
+# herein are fictitious. No association with any real company,
+# organization, product, domain name, email address, logo, person,
+# places, or events is intended or should be inferred.
+#--------------------------------------------------------------------------
+
+import hashlib
+import json
+import os
+
+from file_transfer import MAX_RANGE_SIZE, ParallelFileUploader
+
+# Clear Range requires offsets and lengths aligned to 512 bytes
+CLEAR_RANGE_ALIGNMENT = 512
+
+#
+# Delta sync of a local file to an Azure file.
+#
+# The local file is hashed in fixed-size blocks and compared with a block manifest saved
+# after the previous sync. Only blocks whose hash changed are sent with upload_range;
+# blocks that became all zeros are released with clear_range instead, keeping the Azure
+# file sparse. The manifest records the ETag and last-modified time of the Azure file,
+# and is only trusted if the file has not been written by anyone else since; otherwise
+# the file is recreated and every non-zero block is uploaded.
+#
+class DeltaSync():
+
+    # Input Arguments:
+    # manifest_dir - local directory holding one block manifest per Azure file
+    # block_size - size of the hashed blocks, at most MAX_RANGE_SIZE
+    # max_workers - number of blocks uploaded concurrently
+    def __init__(self, manifest_dir, block_size=MAX_RANGE_SIZE, max_workers=8):
+        if block_size <= 0 or block_size > MAX_RANGE_SIZE:
+            raise ValueError('block_size must be between 1 and ' + str(MAX_RANGE_SIZE) + ' bytes.')
+        self.manifest_dir = manifest_dir
+        self.block_size = block_size
+        self.uploader = ParallelFileUploader(chunk_size=block_size, max_workers=max_workers)
+        self._zero_block = bytes(block_size)
+
+    # Brings file_client up to date with the local file at source_path.
+    # Returns a dict with the number of bytes uploaded, cleared and skipped.
+    def sync(self, file_client, source_path):
+        size = os.path.getsize(source_path)
+        manifest = self._load_manifest(file_client)
+        hashes, zero_blocks = self._hash_blocks(source_path)
+
+        if manifest is not None:
+            if manifest['size'] != size:
+                file_client.resize_file(size)
+            old_hashes = manifest['blocks']
+        else:
+            # Nothing is known about the remote content, start from an empty file of the right size
+            file_client.create_file(size)
+            old_hashes = []
+
+        upload = []
+        clear = []
+        skipped = 0
+        for index, block_hash in enumerate(hashes):
+            offset = index * self.block_size
+            length = min(self.block_size, size - offset)
+            if index < len(old_hashes) and old_hashes[index] == block_hash:
+                skipped += length
+            elif index in zero_blocks:
+                if index >= len(old_hashes):
+                    # Space added by create_file or resize_file already reads as zeros
+                    skipped += length
+                elif offset % CLEAR_RANGE_ALIGNMENT == 0 and length % CLEAR_RANGE_ALIGNMENT == 0:
+                    clear.append((offset, length))
+                else:
+                    upload.append((offset, length))
+            else:
+                upload.append((offset, length))
+
+        for offset, length in clear:
+            file_client.clear_range(offset=offset, length=length)
+        uploaded = self.uploader.upload_ranges(file_client, source_path, upload)
+
+        self._save_manifest(file_client, size, hashes)
+        return {
+            'uploaded': uploaded,
+            'cleared': sum(length for _, length in clear),
+            'skipped': skipped,
+        }
+
+    # Returns the hex digest of every block and the set of block indexes that are all zeros.
+    def _hash_blocks(self, source_path):
+        hashes = []
+        zero_blocks = set()
+        with open(source_path, 'rb') as source_file:
+            while True:
+                block = source_file.read(self.block_size)
+                if not block:
+                    break
+                if block == self._zero_block[:len(block)]:
+                    zero_blocks.add(len(hashes))
+                hashes.append(hashlib.sha256(block).hexdigest())
+        return hashes, zero_blocks
+
+    def _manifest_path(self, file_client):
+        name = hashlib.sha1(file_client.url.encode('utf-8')).hexdigest()
+        return os.path.join(self.manifest_dir, name + '.json')
+
+    # Returns the saved manifest for file_client, or None if it is missing or stale.
+    def _load_manifest(self, file_client):
+        try:
+            with open(self._manifest_path(file_client), 'r') as manifest_file:
+                manifest = json.load(manifest_file)
+        except (IOError, ValueError):
+            return None
+
+        if manifest.get('block_size') != self.block_size:
+            return None
+
+        try:
+            properties = file_client.get_file_properties()
+        except Exception:
+            # The Azure file is gone or unreachable, the manifest cannot be trusted
+            return None
+        if manifest.get('etag') != properties['etag'] or manifest.get('last_modified') != str(properties['last_modified']):
+            return None
+        return manifest
+
+    def _save_manifest(self, file_client, size, hashes):
+        properties = file_client.get_file_properties()
+        manifest = {
+            'url': file_client.url,
+            'size': size,
+            'block_size': self.block_size,
+            'etag': properties['etag'],
+            'last_modified': str(properties['last_modified']),
+            'blocks': hashes,
+        }
+
+        if not os.path.isdir(self.manifest_dir):
+            os.makedirs(self.manifest_dir)
+        manifest_path = self._manifest_path(file_client)
+        # Write to a temporary file first so a crash never leaves a truncated manifest behind
+        with open(manifest_path + '.tmp', 'w') as manifest_file:
+            json.dump(manifest, manifest_file)
+        os.replace(manifest_path + '.tmp', manifest_path)
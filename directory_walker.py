@@ -0,0 +1,155 @@
+#-------------------------------------------------------------------------
+# Microsoft Developer & Platform Evangelism
+#
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# THIS CODE AND INFORMATION ARE PROVIDED "AS IS" WITHOUT WARRANTY OF ANY KIND,
+# EITHER EXPRESSED OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND/OR FITNESS FOR A PARTICULAR PURPOSE.
+#----------------------------------------------------------------------------------
+# The example companies, organizations, products, domain names,
+# e-mail addresses, logos, people, places, and events depicted
+# herein are fictitious. No association with any real company,
+# organization, product, domain name, email address, logo, person,
+# places, or events is intended or should be inferred.
+#--------------------------------------------------------------------------
+
+import queue
+import threading
+
+from concurrency_governor import governed_call
+
+#
+# Recursive, concurrent listing of the directory tree of an Azure file share.
+#
+# list_directories_and_files only returns the direct children of a directory. The walker
+# keeps a queue of directories still to be listed and runs a bounded pool of worker threads
+# over it; each worker pages through one listing lazily and queues the subdirectories it
+# finds. Entries are streamed to the caller through a bounded queue, so when the caller
+# consumes slowly the workers block instead of buffering the whole share in memory.
+# With a ConcurrencyGovernor, a throttled page is fetched again from its continuation token.
+#
+class ShareTreeWalker():
+
+    # Input Arguments:
+    # max_workers - number of directories listed concurrently
+    # max_pending_entries - number of entries buffered before workers wait for the caller
+    # results_per_page - page size requested from the service for each listing
+    # governor - ConcurrencyGovernor limiting the listings in flight, possibly shared with other operations
+    def __init__(self, max_workers=8, max_pending_entries=1000, results_per_page=None, governor=None):
+        if max_workers < 1:
+            raise ValueError('max_workers must be at least 1.')
+        self.max_workers = max_workers
+        self.max_pending_entries = max_pending_entries
+        self.results_per_page = results_per_page
+        self.governor = governor
+
+    # Yields every directory and file under directory_path as a dict with the keys
+    # path, name, is_directory and, for files, size. Order is not deterministic.
+    # An error listing any directory is raised from the generator once the walk stops.
+    def walk(self, share_client, directory_path=''):
+        tree_walk = _ShareTreeWalk(self, share_client)
+        return tree_walk.run(directory_path.strip('/'))
+
+
+# Marks the end of a walk in the results queue.
+_DONE = object()
+
+
+# Error raised while listing a directory, forwarded to the consuming thread.
+class _ListingError():
+
+    def __init__(self, error):
+        self.error = error
+
+
+# State of a single walk: the directory work queue, the bounded results queue and the
+# count of directories queued or being listed, which tells the walk when it is done.
+class _ShareTreeWalk():
+
+    def __init__(self, walker, share_client):
+        self.walker = walker
+        self.share_client = share_client
+        self.directories = queue.Queue()
+        self.results = queue.Queue(maxsize=walker.max_pending_entries)
+        self.stopped = threading.Event()
+        self.lock = threading.Lock()
+        self.pending = 0
+
+    def run(self, directory_path):
+        self._add_directory(directory_path)
+        workers = [threading.Thread(target=self._work) for _ in range(self.walker.max_workers)]
+        for worker in workers:
+            worker.daemon = True
+            worker.start()
+
+        try:
+            while True:
+                item = self.results.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, _ListingError):
+                    raise item.error
+                yield item
+        finally:
+            # Also reached when the caller stops iterating early
+            self.stopped.set()
+            for _ in workers:
+                self.directories.put(None)
+            for worker in workers:
+                worker.join()
+
+    def _add_directory(self, directory_path):
+        with self.lock:
+            self.pending += 1
+        self.directories.put(directory_path)
+
+    def _work(self):
+        while True:
+            directory_path = self.directories.get()
+            if directory_path is None or self.stopped.is_set():
+                return
+            try:
+                self._list_directory(directory_path)
+            except Exception as e:
+                self._put(_ListingError(e))
+            finally:
+                with self.lock:
+                    self.pending -= 1
+                    done = self.pending == 0
+                if done:
+                    self._put(_DONE)
+
+    def _list_directory(self, directory_path):
+        directory_client = self.share_client.get_directory_client(directory_path)
+        # Pages are requested one at a time as the previous one is consumed
+        continuation_token = None
+        while True:
+            page, continuation_token = governed_call(self.walker.governor, self._fetch_page, directory_client, continuation_token)
+            for item in page:
+                path = directory_path + '/' + item['name'] if directory_path else item['name']
+                entry = {'path': path, 'name': item['name'], 'is_directory': item['is_directory']}
+                if item['is_directory']:
+                    self._add_directory(path)
+                else:
+                    entry['size'] = item.get('size')
+                if not self._put(entry):
+                    return
+            if not continuation_token:
+                return
+
+    # Fetches the listing page at continuation_token and returns its items and the next token.
+    def _fetch_page(self, directory_client, continuation_token):
+        listing = directory_client.list_directories_and_files(results_per_page=self.walker.results_per_page)
+        pages = listing.by_page(continuation_token=continuation_token)
+        return list(next(pages, ())), pages.continuation_token
+
+    # Waits for room in the results queue; returns False if the walk was stopped meanwhile.
+    def _put(self, item):
+        while not self.stopped.is_set():
+            try:
+                self.results.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
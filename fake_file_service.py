@@ -0,0 +1,704 @@
+#-------------------------------------------------------------------------
+# Microsoft Developer & Platform Evangelism
+#
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# THIS CODE AND INFORMATION ARE PROVIDED "AS IS" WITHOUT WARRANTY OF ANY KIND,
+# EITHER EXPRESSED OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND/OR FITNESS FOR A PARTICULAR PURPOSE.
+#----------------------------------------------------------------------------------
+# The example companies, organizations, products, domain names,
+# e-mail addresses, logos, people, places, and events depicted
+# herein are fictitious. No association with any real company,
+# organization, product, domain name, email address, logo, person,
+# places, or events is intended or should be inferred.
+#--------------------------------------------------------------------------
+
+import threading
+import time
+import uuid
+import weakref
+
+#
+# In-process stand-ins for the azure.storage.fileshare clients.
+#
+# These fakes implement the subset of the ShareFileClient surface used by the samples
+# and keep all data in memory, so transfer code can be exercised and benchmarked
+# without a storage account or network. They are not a full emulator: use Azurite or
+# a real account to validate service behaviour.
+#
+
+# Raised by the fakes to simulate a transient service failure.
+# Mirrors the status_code / error_code attributes of azure.core HttpResponseError.
+class FakeServiceError(Exception):
+
+    def __init__(self, message, status_code=500, error_code='InternalError'):
+        super(FakeServiceError, self).__init__(message)
+        self.status_code = status_code
+        self.error_code = error_code
+
+
+# Files that have been created, by url, so they can be resolved as copy sources.
+_files_by_url = weakref.WeakValueDictionary()
+
+# Guards the token buckets of the throttled fakes
+_throttle_lock = threading.Lock()
+
+# Guards the shared links of the fakes with a link_bandwidth
+_link_lock = threading.Lock()
+
+
+# Simulated network cost shared by the fake clients.
+# latency - seconds added to every service call, to simulate a round trip
+# bandwidth - bytes per second of a single call's payload, None for unlimited
+# copy_bandwidth - bytes per second at which server-side copies progress, None to complete them at once
+# copy_stall_after - number of bytes after which server-side copies stop progressing, None for never
+# throttle_rate - requests per second accepted before the rest fail with 503 ServerBusy, None for unlimited
+# link_bandwidth - bytes per second shared by all the concurrent calls, as by the client's network link, None for unlimited
+class _FakeEndpoint():
+
+    latency = 0.0
+    bandwidth = None
+    copy_bandwidth = None
+    copy_stall_after = None
+    throttle_rate = None
+    link_bandwidth = None
+
+    def _copy_settings(self):
+        return self.copy_bandwidth, self.copy_stall_after
+
+    def _round_trip(self, transferred=0):
+        if self.latency:
+            time.sleep(self.latency)
+        # A throttled request fails after the round trip, before any payload is transferred
+        self._check_throttle()
+        if transferred:
+            duration = float(transferred) / self.bandwidth if self.bandwidth else 0.0
+            time.sleep(max(duration, self._reserve_link(transferred)))
+
+    # Reserves the shared link for transferred bytes after the transfers already queued on it,
+    # and returns the seconds until this transfer has gone through.
+    def _reserve_link(self, transferred):
+        if not self.link_bandwidth:
+            return 0.0
+        with _link_lock:
+            now = time.monotonic()
+            free_at = max(now, self.__dict__.get('_link_free_at', now)) + float(transferred) / self.link_bandwidth
+            self._link_free_at = free_at
+        return free_at - now
+
+    # Admits a request through a token bucket of throttle_rate tokens per second, holding at
+    # most one second of tokens, and raises ServerBusy when the bucket is empty.
+    def _check_throttle(self):
+        if not self.throttle_rate:
+            return
+        with _throttle_lock:
+            now = time.monotonic()
+            tokens, last = self.__dict__.get('_throttle_bucket', (self.throttle_rate, now))
+            tokens = min(self.throttle_rate, tokens + (now - last) * self.throttle_rate)
+            if tokens < 1:
+                self._throttle_bucket = (tokens, now)
+                raise FakeServiceError('Operation could not be completed within the specified time.',
+                                       status_code=503, error_code='ServerBusy')
+            self._throttle_bucket = (tokens - 1, now)
+
+
+# Downloaded content returned by FakeFileClient.download_file.
+# Mirrors the readall/readinto methods of StorageStreamDownloader.
+class FakeStreamDownloader():
+
+    def __init__(self, content):
+        self._content = content
+        self.size = len(content)
+
+    def readall(self):
+        return bytes(self._content)
+
+    def readinto(self, stream):
+        stream.write(self._content)
+        return self.size
+
+
+class FakeFileClient(_FakeEndpoint):
+
+    # Input Arguments:
+    # name - name of the fake file, used to build its url
+    # latency - seconds to sleep on every service call, to simulate a round trip
+    # fail_every - if set, every Nth upload_range call fails with FakeServiceError
+    # bandwidth - bytes per second at which a single call transfers data, None for unlimited
+    def __init__(self, name='fakefile', latency=0.0, fail_every=0, bandwidth=None):
+        self.file_name = name
+        self.url = 'https://fakeaccount.file.core.windows.net/fakeshare/' + name
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.fail_every = fail_every
+        self._lock = threading.Lock()
+        self._content = bytearray()
+        # Sorted list of [start, end) byte ranges holding data
+        self._ranges = []
+        self._upload_range_calls = 0
+        self._version = 0
+        self._last_modified = time.time()
+        self._metadata = {}
+        self._copy = None
+        # Content, ranges and start time of a server-side copy still pending
+        self._pending_copy = None
+
+    # Moves the ETag and last-modified time forward, as every write on the service does.
+    def _touch(self):
+        self._version += 1
+        self._last_modified = time.time()
+
+    def create_file(self, size, metadata=None, **kwargs):
+        self._round_trip()
+        self._create(size, metadata)
+        return {}
+
+    # Resets the file to size zero bytes and makes it reachable by url as a copy source.
+    def _create(self, size, metadata=None):
+        with self._lock:
+            self._content = bytearray(size)
+            self._ranges = []
+            self._metadata = dict(metadata or {})
+            self._copy = None
+            self._pending_copy = None
+            self._touch()
+        _files_by_url[self.url] = self
+
+    def upload_file(self, data, **kwargs):
+        if hasattr(data, 'read'):
+            data = data.read()
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self.create_file(len(data), metadata=kwargs.get('metadata'))
+        if data:
+            self.upload_range(data, 0, len(data))
+        return {}
+
+    def upload_range(self, data, offset, length, **kwargs):
+        self._round_trip(length)
+        with self._lock:
+            self._upload_range_calls += 1
+            if self.fail_every and self._upload_range_calls % self.fail_every == 0:
+                raise FakeServiceError('Simulated transient failure.', status_code=500)
+            if offset + length > len(self._content):
+                raise FakeServiceError('The range specified is invalid for the current size of the resource.',
+                                       status_code=416, error_code='InvalidRange')
+            self._content[offset:offset + length] = data[:length]
+            self._add_range(offset, offset + length)
+            self._touch()
+        return {}
+
+    def clear_range(self, offset, length, **kwargs):
+        if offset % 512 != 0 or length % 512 != 0:
+            raise ValueError('offset and length must be aligned to 512 bytes.')
+        self._round_trip()
+        with self._lock:
+            self._content[offset:offset + length] = bytes(length)
+            self._remove_range(offset, offset + length)
+            self._touch()
+        return {}
+
+    def resize_file(self, size, **kwargs):
+        self._round_trip()
+        with self._lock:
+            if size < len(self._content):
+                del self._content[size:]
+                self._remove_range(size, float('inf'))
+            else:
+                self._content.extend(bytes(size - len(self._content)))
+            self._touch()
+        return {}
+
+    def get_ranges(self, offset=None, length=None, **kwargs):
+        self._round_trip()
+        start = offset or 0
+        end = start + length if length is not None else None
+        with self._lock:
+            result = []
+            for range_start, range_end in self._ranges:
+                if end is not None and range_start >= end:
+                    break
+                if range_end <= start:
+                    continue
+                range_start = max(range_start, start)
+                range_end = min(range_end, end) if end is not None else range_end
+                # The service reports inclusive end offsets
+                result.append({'start': range_start, 'end': range_end - 1})
+            return result
+
+    def download_file(self, offset=None, length=None, **kwargs):
+        start = offset or 0
+        with self._lock:
+            end = start + length if length is not None else len(self._content)
+            content = bytes(self._content[start:end])
+        self._round_trip(len(content))
+        return FakeStreamDownloader(content)
+
+    def get_file_properties(self, **kwargs):
+        self._round_trip()
+        with self._lock:
+            self._advance_copy()
+            return {
+                'name': self.file_name,
+                'size': len(self._content),
+                'etag': '"0x' + format(self._version, 'X') + '"',
+                'last_modified': self._last_modified,
+                'metadata': dict(self._metadata),
+                'copy': dict(self._copy) if self._copy else {'id': None, 'status': None, 'progress': None},
+            }
+
+    def start_copy_from_url(self, source_url, metadata=None, **kwargs):
+        self._round_trip()
+        source = _files_by_url.get(source_url)
+        if source is None:
+            raise FakeServiceError('The specified resource does not exist.', status_code=404, error_code='CannotVerifyCopySource')
+        with source._lock:
+            content = bytes(source._content)
+            ranges = [list(file_range) for file_range in source._ranges]
+            source_metadata = dict(source._metadata)
+
+        # The copy runs on the service, so it costs no client bandwidth. Without a copy_bandwidth
+        # it completes at once, otherwise it stays pending and progresses as the file is polled
+        copy_bandwidth, copy_stall_after = self._copy_settings()
+        self._create(len(content), metadata if metadata is not None else source_metadata)
+        with self._lock:
+            self._copy = {
+                'id': str(uuid.uuid4()),
+                'status': 'pending',
+                'progress': '0/' + str(len(content)),
+                'source': source_url,
+            }
+            self._pending_copy = (content, ranges, time.time(), copy_bandwidth, copy_stall_after)
+            self._advance_copy()
+            return {'copy_id': self._copy['id'], 'copy_status': self._copy['status']}
+
+    # Moves a pending server-side copy forward to the current time. Called with the lock held.
+    def _advance_copy(self):
+        if self._pending_copy is None:
+            return
+        content, ranges, started, copy_bandwidth, copy_stall_after = self._pending_copy
+        copied = len(content)
+        if copy_bandwidth:
+            copied = min(copied, int((time.time() - started) * copy_bandwidth))
+        if copy_stall_after is not None:
+            copied = min(copied, copy_stall_after)
+
+        if copied < len(content):
+            self._copy['progress'] = str(copied) + '/' + str(len(content))
+            return
+        self._content[:] = content
+        self._ranges = ranges
+        self._copy['status'] = 'success'
+        self._copy['progress'] = str(copied) + '/' + str(copied)
+        self._pending_copy = None
+        self._touch()
+
+    def abort_copy(self, copy_id, **kwargs):
+        self._round_trip()
+        with self._lock:
+            self._advance_copy()
+            if not self._copy or self._copy['id'] != getattr(copy_id, 'id', copy_id) or self._copy['status'] != 'pending':
+                raise FakeServiceError('There is currently no pending copy operation.', status_code=409, error_code='NoPendingCopyOperation')
+            # An aborted copy leaves an empty destination file
+            self._copy['status'] = 'aborted'
+            self._pending_copy = None
+            self._content = bytearray()
+            self._ranges = []
+            self._touch()
+
+    def set_file_metadata(self, metadata=None, **kwargs):
+        self._round_trip()
+        with self._lock:
+            self._metadata = dict(metadata or {})
+            self._touch()
+        return {}
+
+    def delete_file(self, **kwargs):
+        self._round_trip()
+        self._delete()
+
+    def _delete(self):
+        with self._lock:
+            self._content = bytearray()
+            self._ranges = []
+        if _files_by_url.get(self.url) is self:
+            del _files_by_url[self.url]
+
+    # Merges [start, end) into the sorted list of written ranges.
+    def _add_range(self, start, end):
+        merged = []
+        for range_start, range_end in self._ranges:
+            if range_end < start or range_start > end:
+                merged.append([range_start, range_end])
+            else:
+                start = min(start, range_start)
+                end = max(end, range_end)
+        merged.append([start, end])
+        merged.sort()
+        self._ranges = merged
+
+    # Removes [start, end) from the sorted list of written ranges.
+    def _remove_range(self, start, end):
+        remaining = []
+        for range_start, range_end in self._ranges:
+            if range_start < start:
+                remaining.append([range_start, min(range_end, start)])
+            if range_end > end:
+                remaining.append([max(range_start, end), range_end])
+        self._ranges = remaining
+
+
+# Paged listing returned by the fake list operations.
+# Mirrors azure.core.paging.ItemPaged: iterate it for items, or call by_page for pages.
+class FakeItemPaged():
+
+    def __init__(self, items, results_per_page=None, round_trip=None):
+        self._items = items
+        self._results_per_page = results_per_page or 5000
+        self._round_trip = round_trip
+        self.continuation_token = None
+
+    def __iter__(self):
+        for page in self.by_page():
+            for item in page:
+                yield item
+
+    def by_page(self, continuation_token=None):
+        return FakePageIterator(self, continuation_token)
+
+
+# Page iterator returned by FakeItemPaged.by_page. Like the azure.core PageIterator, its
+# continuation_token is the token of the page after the one last returned, or None.
+class FakePageIterator():
+
+    def __init__(self, item_paged, continuation_token=None):
+        self._item_paged = item_paged
+        self._start = int(continuation_token or 0)
+        self._done = False
+        self.continuation_token = continuation_token
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._done:
+            raise StopIteration
+        paged = self._item_paged
+        # Every page is a separate service call
+        if paged._round_trip:
+            paged._round_trip()
+        end = self._start + paged._results_per_page
+        page = paged._items[self._start:end]
+        self.continuation_token = str(end) if end < len(paged._items) else None
+        paged.continuation_token = self.continuation_token
+        self._done = self.continuation_token is None
+        self._start = end
+        return iter(page)
+
+
+
+# In-process stand-in for ShareDirectoryClient, bound to a path of a FakeShareClient.
+class FakeDirectoryClient():
+
+    def __init__(self, share, directory_path):
+        self.share = share
+        self.share_name = share.share_name
+        self.directory_path = directory_path.strip('/')
+        self.url = share.url + '/' + self.directory_path if self.directory_path else share.url
+
+    def _child_path(self, name):
+        return self.directory_path + '/' + name if self.directory_path else name
+
+    def create_directory(self, metadata=None, **kwargs):
+        self.share._round_trip()
+        self.share._create_directory(self.directory_path, metadata)
+        return {}
+
+    def get_directory_properties(self, **kwargs):
+        self.share._round_trip()
+        with self.share._lock:
+            directory = self.share._directories.get(self.directory_path)
+            if directory is None:
+                raise FakeServiceError('The specified resource does not exist.', status_code=404, error_code='ResourceNotFound')
+            return {
+                'name': self.directory_path.rpartition('/')[2],
+                'etag': '"0x' + format(directory['version'], 'X') + '"',
+                'last_modified': directory['last_modified'],
+                'metadata': dict(directory['metadata']),
+            }
+
+    def set_directory_metadata(self, metadata, **kwargs):
+        self.share._round_trip()
+        with self.share._lock:
+            directory = self.share._directories.get(self.directory_path)
+            if directory is None:
+                raise FakeServiceError('The specified resource does not exist.', status_code=404, error_code='ResourceNotFound')
+            directory['metadata'] = dict(metadata or {})
+            directory['version'] += 1
+            directory['last_modified'] = time.time()
+        return {}
+
+    def delete_directory(self, **kwargs):
+        self.share._round_trip()
+        self.share._delete_directory(self.directory_path)
+
+    def create_subdirectory(self, directory_name, **kwargs):
+        directory_client = self.get_subdirectory_client(directory_name)
+        directory_client.create_directory(**kwargs)
+        return directory_client
+
+    def get_subdirectory_client(self, directory_name):
+        return FakeDirectoryClient(self.share, self._child_path(directory_name))
+
+    def get_file_client(self, file_name):
+        return self.share.get_file_client(self._child_path(file_name))
+
+    def delete_file(self, file_name, **kwargs):
+        self.get_file_client(file_name).delete_file()
+
+    def list_directories_and_files(self, name_starts_with=None, **kwargs):
+        directory = self.share._directories.get(self.directory_path)
+        if directory is None:
+            raise FakeServiceError('The specified resource does not exist.', status_code=404, error_code='ResourceNotFound')
+        items = [{'name': name, 'is_directory': True} for name in sorted(directory['directories'])]
+        items += [{'name': name, 'size': len(directory['files'][name]._content), 'is_directory': False}
+                  for name in sorted(directory['files'])]
+        if name_starts_with:
+            items = [item for item in items if item['name'].startswith(name_starts_with)]
+        return FakeItemPaged(items, kwargs.get('results_per_page'), self.share._round_trip)
+
+
+# In-process stand-in for ShareClient. Directories and files are kept in memory.
+class FakeShareClient(_FakeEndpoint):
+
+    # Input Arguments:
+    # share_name - name of the fake share, used to build its url
+    # latency - seconds to sleep on every service call, to simulate a round trip
+    # service - the FakeShareServiceClient owning this share, if any
+    # bandwidth - bytes per second at which a single call transfers data, None for unlimited
+    def __init__(self, share_name='fakeshare', latency=0.0, service=None, bandwidth=None):
+        self.share_name = share_name
+        self.url = 'https://fakeaccount.file.core.windows.net/' + share_name
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.service = service
+        self.metadata = {}
+        self.quota = 5120
+        self.last_modified = time.time()
+        self._lock = threading.Lock()
+        # Maps a directory path ('' for the root) to its subdirectory names and file clients
+        self._directories = {'': self._new_directory()}
+
+    def _copy_settings(self):
+        if self.service is not None:
+            return self.service._copy_settings()
+        return self.copy_bandwidth, self.copy_stall_after
+
+    # Shares of a service are throttled by the account-wide rate of the service
+    def _check_throttle(self):
+        if self.service is not None:
+            self.service._check_throttle()
+        else:
+            super(FakeShareClient, self)._check_throttle()
+
+    # Shares of a service transfer over the link of the service
+    def _reserve_link(self, transferred):
+        if self.service is not None:
+            return self.service._reserve_link(transferred)
+        return super(FakeShareClient, self)._reserve_link(transferred)
+
+    def _split(self, path):
+        parent, _, name = path.strip('/').rpartition('/')
+        return parent, name
+
+    def _new_directory(self, metadata=None):
+        return {'directories': set(), 'files': {}, 'metadata': dict(metadata or {}), 'version': 1, 'last_modified': time.time()}
+
+    def _create_directory(self, directory_path, metadata=None):
+        parent, name = self._split(directory_path)
+        with self._lock:
+            if parent not in self._directories:
+                raise FakeServiceError('The specified parent path does not exist.', status_code=404, error_code='ParentNotFound')
+            if directory_path in self._directories:
+                raise FakeServiceError('The specified resource already exists.', status_code=409, error_code='ResourceAlreadyExists')
+            self._directories[parent]['directories'].add(name)
+            self._directories[directory_path] = self._new_directory(metadata)
+
+    def _delete_directory(self, directory_path):
+        parent, name = self._split(directory_path)
+        with self._lock:
+            directory = self._directories.get(directory_path)
+            if directory is None:
+                raise FakeServiceError('The specified resource does not exist.', status_code=404, error_code='ResourceNotFound')
+            if directory['directories'] or directory['files']:
+                raise FakeServiceError('The specified directory is not empty.', status_code=409, error_code='DirectoryNotEmpty')
+            del self._directories[directory_path]
+            self._directories[parent]['directories'].discard(name)
+
+    def create_share(self, metadata=None, quota=None, **kwargs):
+        self._round_trip()
+        self.metadata = metadata or {}
+        self.quota = quota or 5120
+        self.last_modified = time.time()
+        if self.service is not None:
+            self.service._add_share(self)
+        return {}
+
+    def delete_share(self, delete_snapshots=False, **kwargs):
+        self._round_trip()
+        if self.service is not None:
+            self.service._remove_share(self.share_name)
+
+    def get_share_properties(self, **kwargs):
+        self._round_trip()
+        with self._lock:
+            return {
+                'name': self.share_name,
+                'etag': '"0x' + format(int(self.last_modified * 1000), 'X') + '"',
+                'last_modified': self.last_modified,
+                'quota': self.quota,
+                'metadata': dict(self.metadata),
+            }
+
+    def set_share_metadata(self, metadata, **kwargs):
+        self._round_trip()
+        with self._lock:
+            self.metadata = dict(metadata or {})
+            self.last_modified = time.time()
+        return {}
+
+    def create_directory(self, directory_name, **kwargs):
+        directory_client = self.get_directory_client(directory_name)
+        directory_client.create_directory(**kwargs)
+        return directory_client
+
+    def delete_directory(self, directory_name, **kwargs):
+        self.get_directory_client(directory_name).delete_directory()
+
+    def get_directory_client(self, directory_path=None):
+        return FakeDirectoryClient(self, directory_path or '')
+
+    def get_file_client(self, file_path):
+        parent, name = self._split(file_path)
+        with self._lock:
+            file_client = self._directories.get(parent, {}).get('files', {}).get(name)
+        if file_client is None:
+            file_client = _FakeShareFileClient(self, parent, name)
+        return file_client
+
+    def list_directories_and_files(self, directory_name=None, name_starts_with=None, **kwargs):
+        return self.get_directory_client(directory_name).list_directories_and_files(name_starts_with, **kwargs)
+
+
+# A FakeFileClient that registers itself in its share's directory once created,
+# and removes itself when deleted, so it shows up in listings.
+class _FakeShareFileClient(FakeFileClient):
+
+    def __init__(self, share, parent, name):
+        super(_FakeShareFileClient, self).__init__(name)
+        self.share = share
+        self.share_name = share.share_name
+        self.file_path = parent + '/' + name if parent else name
+        self.url = share.url + '/' + self.file_path
+        self._parent = parent
+
+    def _round_trip(self, transferred=0):
+        # Follows the network settings of the share, which may be changed after the file was created
+        self.share._round_trip(transferred)
+
+    def _copy_settings(self):
+        return self.share._copy_settings()
+
+    def _create(self, size, metadata=None):
+        with self.share._lock:
+            directory = self.share._directories.get(self._parent)
+            if directory is None:
+                raise FakeServiceError('The specified parent path does not exist.', status_code=404, error_code='ParentNotFound')
+            directory['files'][self.file_name] = self
+        super(_FakeShareFileClient, self)._create(size, metadata)
+
+    def _delete(self):
+        with self.share._lock:
+            files = self.share._directories.get(self._parent, {}).get('files', {})
+            if files.get(self.file_name) is not self:
+                raise FakeServiceError('The specified resource does not exist.', status_code=404, error_code='ResourceNotFound')
+            del files[self.file_name]
+        super(_FakeShareFileClient, self)._delete()
+
+
+# Share item yielded by FakeShareServiceClient.list_shares.
+# Mirrors the attribute and key access of ShareProperties.
+class FakeShareProperties():
+
+    def __init__(self, name, last_modified, quota=5120, metadata=None):
+        self.name = name
+        self.last_modified = last_modified
+        self.quota = quota
+        self.etag = '"0x' + format(int(last_modified * 1000), 'X') + '"'
+        self.metadata = metadata
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+
+# In-process stand-in for ShareServiceClient, holding FakeShareClient instances by name.
+class FakeShareServiceClient(_FakeEndpoint):
+
+    # Input Arguments:
+    # latency - seconds to sleep on every service call, to simulate a round trip
+    # bandwidth - bytes per second at which a single call transfers data, None for unlimited
+    # copy_bandwidth - bytes per second at which server-side copies progress, None to complete them at once
+    # copy_stall_after - number of bytes after which server-side copies stop progressing, None for never
+    # throttle_rate - requests per second accepted across the account before ServerBusy, None for unlimited
+    # link_bandwidth - bytes per second shared by all the concurrent calls to the account, None for unlimited
+    def __init__(self, latency=0.0, bandwidth=None, copy_bandwidth=None, copy_stall_after=None, throttle_rate=None,
+                 link_bandwidth=None):
+        self.url = 'https://fakeaccount.file.core.windows.net/'
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.copy_bandwidth = copy_bandwidth
+        self.copy_stall_after = copy_stall_after
+        self.throttle_rate = throttle_rate
+        self.link_bandwidth = link_bandwidth
+        self._lock = threading.Lock()
+        self._shares = {}
+
+    def _add_share(self, share_client):
+        with self._lock:
+            if share_client.share_name in self._shares:
+                raise FakeServiceError('The specified share already exists.', status_code=409, error_code='ShareAlreadyExists')
+            self._shares[share_client.share_name] = share_client
+
+    def _remove_share(self, share_name):
+        with self._lock:
+            if share_name not in self._shares:
+                raise FakeServiceError('The specified share does not exist.', status_code=404, error_code='ShareNotFound')
+            del self._shares[share_name]
+
+    def create_share(self, share_name, **kwargs):
+        share_client = FakeShareClient(share_name, latency=self.latency, service=self, bandwidth=self.bandwidth)
+        share_client.create_share(**kwargs)
+        return share_client
+
+    def delete_share(self, share_name, delete_snapshots=False, **kwargs):
+        self._round_trip()
+        self._remove_share(getattr(share_name, 'name', share_name))
+
+    def get_share_client(self, share, snapshot=None):
+        share_name = getattr(share, 'name', share)
+        with self._lock:
+            share_client = self._shares.get(share_name)
+        return share_client or FakeShareClient(share_name, latency=self.latency, service=self, bandwidth=self.bandwidth)
+
+    def list_shares(self, name_starts_with=None, include_metadata=False, include_snapshots=False, **kwargs):
+        with self._lock:
+            shares = [self._shares[name] for name in sorted(self._shares)
+                      if not name_starts_with or name.startswith(name_starts_with)]
+        items = [FakeShareProperties(share.share_name, share.last_modified, share.quota,
+                                     dict(share.metadata) if include_metadata else None)
+                 for share in shares]
+        return FakeItemPaged(items, kwargs.get('results_per_page'), self._round_trip)
@@ -16,9 +16,11 @@
 
 import os
 from random_data import RandomData
-
-from azure.storage.fileshare import ShareServiceClient
-from azure.storage.fileshare import CorsRule, RetentionPolicy, Metrics
+from bulk_operations import BulkOperations
+from concurrency_governor import ConcurrencyGovernor
+from client_factory import get_client_factory
+from properties_cache import PropertiesCache
+from share_listing import ShareLister
 
 #
 # Azure File Service Sample - Demonstrate how to perform common tasks using the Microsoft Azure File Service.  
@@ -40,8 +42,9 @@ class FileAdvancedSamples():
         print('Azure Storage File Advanced samples - Starting.')
         
         try:
-            # Create an instance of ShareServiceClient
-            service = ShareServiceClient.from_connection_string(conn_str=connection_string)
+            # Get the ShareServiceClient shared by all samples
+            # The connection string is parsed once and the HTTP connections are pooled across runners
+            service = get_client_factory(connection_string).get_service_client()
 
             # List shares
             print('\n\n* List shares *\n')
@@ -68,15 +71,20 @@ class FileAdvancedSamples():
     # List file shares
     def list_shares(self, service):
         share_prefix = 'sharesample' + self.random_data.get_random_name(6)
+        share_names = [share_prefix + str(i) for i in range(5)]
+        # Shares are created and deleted concurrently, with a result reported for each one.
+        # Requests throttled by the service are retried after a jittered backoff, with fewer in flight
+        bulk = BulkOperations(max_workers=5, governor=ConcurrencyGovernor(initial_limit=5, max_limit=5))
 
         try:        
             print('1. Create multiple shares with prefix: ', share_prefix)
-            for i in range(5):
-                service.create_share(share_name=share_prefix + str(i))
+            for result in bulk.create_shares(service, share_names):
+                if not result.succeeded:
+                    print('  Could not create share ' + result.name + ':', result.error)
             
-            print('2. List shares')
-            shares = service.list_shares()
-            for share in shares:
+            print('2. List shares with prefix: ', share_prefix)
+            # The prefix is filtered by the service, and the shares are fetched two per page
+            for share in ShareLister(results_per_page=2).list_shares(service, name_starts_with=share_prefix):
                 print('  Share name:' + share.name)
 
         except Exception as e:
@@ -84,12 +92,16 @@ class FileAdvancedSamples():
 
         finally:
             print('3. Delete shares with prefix:' + share_prefix) 
-            for i in range(5):
-                service.delete_share(share_prefix + str(i))
+            for result in bulk.delete_shares(service, share_names):
+                if not result.succeeded:
+                    print('  Could not delete share ' + result.name + ':', result.error)
     
 
     # Set CORS
     def set_cors_rules(self, service):
+        # The SDK models are imported when first used, so importing this module stays cheap
+        from azure.storage.fileshare import CorsRule
+
         print('1. Get Cors Rules')
         original_cors_rules = service.get_service_properties()['cors']
 
@@ -115,6 +127,7 @@ class FileAdvancedSamples():
 
     # Manage properties of the File service, including logging and metrics settings, and the default service version.
     def set_service_properties(self, service):
+        from azure.storage.fileshare import RetentionPolicy, Metrics
 
         print('1. Get File service properties')
         props = service.get_service_properties()
@@ -137,6 +150,10 @@ class FileAdvancedSamples():
     # Manage metadata and properties of the share
     def metadata_and_properties(self, service):
         share_name = 'sharename' + self.random_data.get_random_name(6)
+        # Properties are read through a cache, so repeated reads of the same object
+        # within the TTL do not go to the service. The clients are wrapped by the cache,
+        # so writes made through them invalidate the cached properties
+        properties_cache = PropertiesCache(ttl=30)
 
         try:
             # All directories and share must be created in a parent share.
@@ -144,7 +161,7 @@ class FileAdvancedSamples():
             print('1. Create sample share with name ' + share_name)
             quota = 1 # in GB
             metadata = { "foo": "bar", "baz": "foo" }
-            share_client = service.create_share(share_name=share_name)
+            share_client = properties_cache.wrap(service.create_share(share_name=share_name))
             print('Sample share "'+ share_name +'" created.')
 
             print('2. Get share properties.')
@@ -181,12 +198,16 @@ class FileAdvancedSamples():
 
             print('8. Get file properties.')
             properties = file_client.get_file_properties()
+            print('\tsize: ' + str(properties['size']))
 
+            # Read again within the TTL, so served from the cache
             print('9. Get file metadata.')
-            get_metadata = properties['metadata']
+            get_metadata = file_client.get_file_properties()['metadata']
             for k, v in get_metadata.items():
                 print("\t" + k + ": " + v)
 
+            print('Properties cache statistics:', properties_cache.stats())
+
             # This is for demo purposes, all files will be deleted when share is deleted
             print('10. Delete file.')
             file_client.delete_file()
@@ -0,0 +1,178 @@
+#-------------------------------------------------------------------------
+# Microsoft Developer & Platform Evangelism
+#
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# THIS CODE AND INFORMATION ARE PROVIDED "AS IS" WITHOUT WARRANTY OF ANY KIND,
+# EITHER EXPRESSED OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND/OR FITNESS FOR A PARTICULAR PURPOSE.
+#----------------------------------------------------------------------------------
+# The example companies, organizations, products, domain names,
+# e-mail addresses, logos, people, places, and events depicted
+# herein are fictitious. No association with any real company,
+# organization, product, domain name, email address, logo, person,
+# places, or events is intended or should be inferred.
+#--------------------------------------------------------------------------
+
+import asyncio
+from random_data import RandomData
+from instrumentation import instrument_if_enabled
+
+#
+# asyncio version of FileAdvancedSamples, built on the azure.storage.fileshare.aio clients.
+#
+# The list shares, CORS, service properties and metadata samples do not depend on each
+# other, so they run concurrently with asyncio.gather. Every request goes through one
+# semaphore, which bounds the number of requests in flight across all samples. Because
+# the samples run at the same time their output lines are interleaved.
+#
+class FileAdvancedSamplesAsync():
+
+    # Input Arguments:
+    # max_concurrency - number of requests allowed in flight at the same time
+    def __init__(self, max_concurrency=8):
+        self.random_data = RandomData()
+        self.max_concurrency = max_concurrency
+
+    # Runs all samples for Azure Storage File service.
+    async def run_all_samples(self, connection_string):
+        print('Azure Storage File Advanced samples (asyncio) - Starting.')
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        # The SDK is imported when the samples run, so importing this module stays cheap
+        from azure.storage.fileshare.aio import ShareServiceClient
+
+        try:
+            # Create an instance of ShareServiceClient
+            async with ShareServiceClient.from_connection_string(conn_str=connection_string) as service:
+                service = instrument_if_enabled(service)
+                samples = [
+                    ('List shares', self.list_shares(service)),
+                    ('Set cors rules', self.set_cors_rules(service)),
+                    ('Set service properties', self.set_service_properties(service)),
+                    ('Metadata and properties', self.metadata_and_properties(service)),
+                ]
+                results = await asyncio.gather(*[sample for _, sample in samples], return_exceptions=True)
+
+                for (name, _), result in zip(samples, results):
+                    if isinstance(result, Exception):
+                        print('Error occurred in the sample "' + name + '".', result)
+
+        except Exception as e:
+            print('Error occurred in the sample.', e)
+
+        finally:
+            print('\nAzure Storage File Advanced samples (asyncio) - Completed.\n')
+
+    # Awaits a single service request once the shared semaphore allows it.
+    async def _request(self, coroutine):
+        async with self.semaphore:
+            return await coroutine
+
+    # List file shares
+    async def list_shares(self, service):
+        share_prefix = 'sharesample' + self.random_data.get_random_name(6)
+        share_names = [share_prefix + str(i) for i in range(5)]
+
+        try:
+            print('[list shares] 1. Create multiple shares with prefix: ', share_prefix)
+            await asyncio.gather(*[self._request(service.create_share(share_name=name)) for name in share_names])
+
+            print('[list shares] 2. List shares')
+            async for share in service.list_shares(name_starts_with=share_prefix):
+                print('[list shares]   Share name:' + share.name)
+
+        except Exception as e:
+            print(e)
+
+        finally:
+            print('[list shares] 3. Delete shares with prefix:' + share_prefix)
+            results = await asyncio.gather(*[self._request(service.delete_share(name)) for name in share_names],
+                                           return_exceptions=True)
+            for name, result in zip(share_names, results):
+                if isinstance(result, Exception):
+                    print('[list shares]   Could not delete share ' + name + ':', result)
+
+    # Set CORS
+    async def set_cors_rules(self, service):
+        from azure.storage.fileshare import CorsRule
+
+        print('[cors] 1. Get Cors Rules')
+        original_cors_rules = (await self._request(service.get_service_properties()))['cors']
+
+        print('[cors] 2. Overwrite Cors Rules')
+        cors_rule = CorsRule(
+            allowed_origins=['*'],
+            allowed_methods=['POST', 'GET'],
+            allowed_headers=['*'],
+            exposed_headers=['*'],
+            max_age_in_seconds=3600)
+
+        try:
+            # Only the cors element is sent, so this does not overwrite the metrics
+            # changed concurrently by set_service_properties
+            await self._request(service.set_service_properties(cors=[cors_rule]))
+        except Exception as e:
+            print(e)
+        finally:
+            #reverting cors rules back to the original ones
+            print('[cors] 3. Revert Cors Rules back the original ones')
+            await self._request(service.set_service_properties(cors=original_cors_rules))
+
+        print("[cors] CORS sample completed")
+
+    # Manage properties of the File service, including logging and metrics settings, and the default service version.
+    async def set_service_properties(self, service):
+        from azure.storage.fileshare import RetentionPolicy, Metrics
+
+        print('[service properties] 1. Get File service properties')
+        props = await self._request(service.get_service_properties())
+
+        retention = RetentionPolicy(enabled=True, days=5)
+        hour_metrics = Metrics(enabled=True, include_apis=True, retention_policy=retention)
+        minute_metrics = Metrics(enabled=False)
+
+        try:
+            print('[service properties] 2. Ovewrite File service properties')
+            await self._request(service.set_service_properties(hour_metrics=hour_metrics, minute_metrics=minute_metrics))
+
+        finally:
+            print('[service properties] 3. Revert File service properties back to the original ones')
+            await self._request(service.set_service_properties(hour_metrics=props['hour_metrics'], minute_metrics=props['minute_metrics']))
+
+        print('[service properties] 4. Set File service properties completed')
+
+    # Manage metadata and properties of the share
+    async def metadata_and_properties(self, service):
+        share_name = 'sharename' + self.random_data.get_random_name(6)
+        dir_name = 'dirname' + self.random_data.get_random_name(6)
+        file_name = 'sample.txt'
+
+        try:
+            print('[metadata] 1. Create sample share with name ' + share_name)
+            share_client = await self._request(service.create_share(share_name=share_name, metadata={"foo": "bar", "baz": "foo"}))
+
+            print('[metadata] 2. Create sample directory with name ' + dir_name)
+            directory_client = await self._request(share_client.create_directory(dir_name, metadata={"abc": "def", "jkl": "mno"}))
+
+            print('[metadata] 3. Upload sample file from text to directory.')
+            file_client = directory_client.get_file_client(file_name)
+            await self._request(file_client.upload_file('Hello World! - from text sample', metadata={"prop1": "val1", "prop2": "val2"}))
+
+            # The three property reads are independent of each other
+            print('[metadata] 4. Get share, directory and file properties.')
+            all_properties = await asyncio.gather(
+                self._request(share_client.get_share_properties()),
+                self._request(directory_client.get_directory_properties()),
+                self._request(file_client.get_file_properties()))
+
+            for label, properties in zip(['share', 'directory', 'file'], all_properties):
+                print('[metadata] ' + label + ' metadata:')
+                for k, v in properties['metadata'].items():
+                    print("[metadata] \t" + k + ": " + v)
+
+        finally:
+            # All directories and files are deleted with the share
+            print('[metadata] 5. Delete share.')
+            await self._request(service.delete_share(share_name))
+
+        print("[metadata] Metadata and properties sample completed")
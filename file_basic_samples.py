@@ -15,11 +15,15 @@
 #--------------------------------------------------------------------------
 
 from random_data import RandomData
+from directory_walker import ShareTreeWalker
+from bulk_operations import BulkOperations
+from copy_manager import CopyManager
+from dedupe_upload import DedupeUploader
+from client_factory import get_client_factory
+from transfer_profiles import create_uploader, create_downloader
 import tempfile
 import os
 
-from azure.storage.fileshare import ShareServiceClient
-
 
 class FileBasicSamples():
 
@@ -35,14 +39,15 @@ class FileBasicSamples():
         sharename = 'sharesample' + self.random_data.get_random_name(6)
         
         try:
-            # Create an instance of ShareServiceClient
-            service = ShareServiceClient.from_connection_string(conn_str=connection_string)
+            # Get the ShareServiceClient shared by all samples
+            # The connection string is parsed once and the HTTP connections are pooled across runners
+            service = get_client_factory(connection_string).get_service_client()
 
             print('\n\n* Basic file operations *\n')
             self.basic_file_operations(sharename, filename, service)
 
         except Exception as e:
-            print('error:' + e) 
+            print('error:', e)
 
         finally:
             # Delete all Azure Files created in this sample
@@ -83,14 +88,13 @@ class FileBasicSamples():
         # Create another file client which will copy the file from url
         destination_file_client = share_client.get_file_client('file1copy')
 
-        # Copy the sample source file from the url to the destination file
-        copy_resp = destination_file_client.start_copy_from_url(source_url=file_client.url)
-        if copy_resp['copy_status'] ==  'pending':
-            # Demonstrate how to abort a copy operation (just for demo, probably will never get here)
-            print('Abort copy operation')
-            destination_file.abort_copy()
-        else:
-            print('Copy was a ' + copy_resp['copy_status'])
+        # Copy the sample source file from the url to the destination file. The copy manager
+        # polls the server-side copy until it completes, aborts it if it stalls and then
+        # finishes it with a client-side ranged copy
+        copy_result = CopyManager().copy_files([(file_client, destination_file_client)])[0]
+        print('Copy was a ' + copy_result.status + ' (' + copy_result.method + ' copy)')
+        if copy_result.error:
+            print('Copy error:', copy_result.error)
         
 
         # Demonstrate how to create a share and upload a file from a local temporary file path
@@ -108,8 +112,11 @@ class FileBasicSamples():
         file_client = share_client.get_file_client(filename)
 
         # Upload a file
-        with open(my_temp_file.name, "rb") as source_file:
-            file_client.upload_file(source_file)
+        # The file is created at full size and sent in ranges from a pool of workers, which keeps
+        # the bandwidth busy for large files; the range size and the number of workers are set by
+        # the active transfer profile (see transfer_profiles.py)
+        uploader = create_uploader()
+        uploader.upload(file_client, my_temp_file.name)
 
         print('Sample file "' + filename + '" uploaded from path to share: ' + sharename)
 
@@ -130,25 +137,42 @@ class FileBasicSamples():
         # The following example download the file that was previously uploaded to Azure Files
         print('\nAttempting to download a sample file from Azure files for demonstration.')
 
-        destination_file = tempfile.tempdir + '\mypathfile.txt'
+        destination_file = os.path.join(tempfile.gettempdir(), 'mypathfile.txt')
 
-        with open(destination_file, "wb") as file_handle:
-            data = file_client.download_file()
-            data.readinto(file_handle)
+        # The destination is pre-sized and memory-mapped, and the valid ranges of the file
+        # are downloaded concurrently straight into it
+        downloader = create_downloader()
+        downloader.download(file_client, destination_file)
 
         print('Sample file downloaded to: ' + destination_file)
 
 
+        # Demonstrate how to upload the same content to several paths without sending it again
+        print('\nUploading the sample file from path to three more paths with deduplication.')
+        # The content hash is kept in the file metadata and in a local index, and files whose
+        # content is already in the share are filled with a server-side copy
+        index_path = os.path.join(tempfile.gettempdir(), 'mydedupeindex.sqlite')
+        dedupe = DedupeUploader(index_path)
+        try:
+            results = dedupe.upload_files([(share_client.get_file_client('dedupe' + str(i)), my_temp_file.name) for i in range(3)])
+            summary = DedupeUploader.summarize(results)
+            print('Uploaded: ' + str(summary['upload']) + ', copied: ' + str(summary['copy']) +
+                  ', bytes saved: ' + str(summary['bytes_saved']))
+        finally:
+            dedupe.close()
+            os.remove(index_path)
+
+
         # Demonstrate how to list files and directories contains under Azure File share
         print('\nAttempting to list files and directories directory under share "' + sharename + '":')
 
         # Create a generator to list directories and files under share
-        # This is not a recursive listing operation
-        generator = share_client.list_directories_and_files()
+        # The walker lists subdirectories recursively, several directories at a time
+        generator = ShareTreeWalker(max_workers=4).walk(share_client)
 
         # Prints the directories and files under the share
         for file_or_dir in generator:
-            print(file_or_dir['name'])
+            print(file_or_dir['path'])
         
         # remove temp file
         os.remove(my_temp_file.name)
@@ -163,24 +187,22 @@ class FileBasicSamples():
         print('\nDeleting all samples created for this demonstration.')
 
         try:
-            # Deleting file: 'sharename/mydirectory/filename'
+            # Deleting the files and directories under 'sharename'
             # This is for demo purposes only, it's unnecessary, as we're deleting the share later
-            print('Deleting a sample file.')
+            # Files are deleted in parallel first, then directories bottom-up, one level at a time
+            print('Deleting sample files and directories.')
 
             share_client = service.get_share_client(sharename)
-            directory_client = share_client.get_directory_client('mydirectory')
-            
-            directory_client.delete_file(file_name=filename)
-            print('Sample file "' + filename + '" deleted from: ' + sharename + '/mydirectory' )
 
-            # Deleting directory: 'sharename/mydirectory'
-            print('Deleting sample directory and all files and directories under it.')
-            share_client.delete_directory('mydirectory')
-            print('Sample directory "/mydirectory" deleted from: ' + sharename)
+            for result in BulkOperations().delete_tree(share_client):
+                if result.succeeded:
+                    print('Deleted "' + result.name + '" from: ' + sharename)
+                else:
+                    print('Could not delete "' + result.name + '":', result.error)
 
             # Deleting share: 'sharename'
             print('Deleting sample share ' + sharename + ' and all files and directories under it.')
-            share_client.delete_share(sharename)
+            share_client.delete_share()
             print('Sample share "' + sharename + '" deleted.')
 
             print('\nCompleted successfully - Azure Files samples deleted.')
@@ -0,0 +1,173 @@
+#-------------------------------------------------------------------------
+# Microsoft Developer & Platform Evangelism
+#
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# THIS CODE AND INFORMATION ARE PROVIDED "AS IS" WITHOUT WARRANTY OF ANY KIND,
+# EITHER EXPRESSED OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND/OR FITNESS FOR A PARTICULAR PURPOSE.
+#----------------------------------------------------------------------------------
+# The example companies, organizations, products, domain names,
+# e-mail addresses, logos, people, places, and events depicted
+# herein are fictitious. No association with any real company,
+# organization, product, domain name, email address, logo, person,
+# places, or events is intended or should be inferred.
+#--------------------------------------------------------------------------
+
+from random_data import RandomData
+from instrumentation import instrument_if_enabled
+from file_transfer import MAX_RANGE_SIZE, split_ranges
+import asyncio
+import tempfile
+import os
+
+#
+# asyncio version of FileBasicSamples, built on the azure.storage.fileshare.aio clients.
+# Dependent steps are awaited in order; the ranges of the local file upload and download
+# are transferred concurrently, bounded by a semaphore.
+#
+class FileBasicSamplesAsync():
+
+    # Input Arguments:
+    # max_concurrency - number of requests allowed in flight at the same time
+    # chunk_size - size of each range of the local file uploaded and downloaded
+    def __init__(self, max_concurrency=8, chunk_size=MAX_RANGE_SIZE):
+        self.random_data = RandomData()
+        self.max_concurrency = max_concurrency
+        self.chunk_size = chunk_size
+
+    # Runs all samples for Azure Storage File service.
+    async def run_all_samples(self, connection_string):
+        print('Azure Storage File Basis samples (asyncio) - Starting.')
+
+        #declare variables
+        filename = 'filesample' + self.random_data.get_random_name(6)
+        sharename = 'sharesample' + self.random_data.get_random_name(6)
+
+        # Create an instance of ShareServiceClient
+        # The SDK is imported when the samples run, so importing this module stays cheap
+        from azure.storage.fileshare.aio import ShareServiceClient
+        async with ShareServiceClient.from_connection_string(conn_str=connection_string) as service:
+            service = instrument_if_enabled(service)
+            try:
+                print('\n\n* Basic file operations *\n')
+                await self.basic_file_operations(sharename, filename, service)
+
+            except Exception as e:
+                print('error:', e)
+
+            finally:
+                # Delete all Azure Files created in this sample
+                await self.file_delete_samples(sharename, filename, service)
+
+        print('\nAzure Storage File Basic samples (asyncio) - Completed.\n')
+
+    async def basic_file_operations(self, sharename, filename, service):
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        # Creating an SMB file share in your Azure Files account.
+        print('Creating sample share.')
+        share_client = await service.create_share(share_name=sharename)
+        print('Sample share "'+ sharename +'" created.')
+
+        # Creating an optional file directory in your Azure Files account.
+        print('Creating a sample directory.')
+        directory_client = await share_client.create_directory("mydirectory")
+        print('Sample directory "mydirectory" created.')
+
+        # Uploading text to sharename/mydirectory/my_text_file in Azure Files account.
+        print('Uploading a sample file from text.')
+        file_client = directory_client.get_file_client(filename)
+        await file_client.upload_file('Hello World! - from text sample')
+        print('Sample file "' + filename + '" created and uploaded to: ' + sharename + '/mydirectory')
+
+        # Demonstrate how to copy a file
+        print('\nCopying file ' + filename)
+        destination_file_client = share_client.get_file_client('file1copy')
+        copy_resp = await destination_file_client.start_copy_from_url(source_url=file_client.url)
+        if copy_resp['copy_status'] == 'pending':
+            print('Abort copy operation')
+            await destination_file_client.abort_copy(copy_resp['copy_id'])
+        else:
+            print('Copy was a ' + copy_resp['copy_status'])
+
+        # Demonstrate how to upload a file from a local temporary file path
+        print('\nCreating a temporary file from text.')
+        with tempfile.NamedTemporaryFile(delete=False) as my_temp_file:
+            my_temp_file.file.write(b"Hello world!")
+
+        try:
+            # The file is created at full size and its ranges are uploaded concurrently
+            print('Uploading a sample file from local path.')
+            file_client = share_client.get_file_client(filename)
+            size = os.path.getsize(my_temp_file.name)
+            await file_client.create_file(size)
+
+            async def upload_range(offset, length):
+                # Read once the semaphore is held, so only max_concurrency ranges are in memory
+                with open(my_temp_file.name, 'rb') as source_file:
+                    source_file.seek(offset)
+                    data = source_file.read(length)
+                await file_client.upload_range(data, offset, length)
+
+            await asyncio.gather(*[self._bounded(semaphore, upload_range(offset, length))
+                                   for offset, length in split_ranges(size, self.chunk_size)])
+            print('Sample file "' + filename + '" uploaded from path to share: ' + sharename)
+        finally:
+            os.remove(my_temp_file.name)
+
+        # Get the list of valid ranges and write to the specified range
+        print('\nGet list of valid ranges of the file.')
+        file_ranges = await file_client.get_ranges()
+
+        data = b'abcdefghijkl'
+        print('Put a range of data to the file.')
+        await file_client.upload_range(data=data, offset=file_ranges[0]['start'], length=len(data))
+
+        # Demonstrate how to download a file from Azure Files, fetching the valid ranges concurrently
+        print('\nAttempting to download a sample file from Azure files for demonstration.')
+        destination_file = os.path.join(tempfile.gettempdir(), 'mypathfile.txt')
+        file_ranges = await file_client.get_ranges()
+        properties = await file_client.get_file_properties()
+
+        with open(destination_file, 'wb') as file_handle:
+            file_handle.truncate(properties['size'])
+
+            async def download_range(offset, length):
+                downloader = await file_client.download_file(offset=offset, length=length)
+                content = await downloader.readall()
+                # No await between seek and write, so concurrent ranges cannot interleave here
+                file_handle.seek(offset)
+                file_handle.write(content)
+
+            await asyncio.gather(*[self._bounded(semaphore, download_range(file_range['start'] + offset, length))
+                                   for file_range in file_ranges
+                                   for offset, length in split_ranges(file_range['end'] + 1 - file_range['start'], self.chunk_size)])
+        print('Sample file downloaded to: ' + destination_file)
+
+        # Demonstrate how to list files and directories contains under Azure File share
+        print('\nAttempting to list files and directories directory under share "' + sharename + '":')
+        async for file_or_dir in share_client.list_directories_and_files():
+            print(file_or_dir['name'])
+        print('Files and directories under share "' + sharename + '" listed.')
+        print('\nCompleted successfully - Azure basic Files operations.')
+
+    # Demonstrate how to delete azure files created for this demonstration
+    # Warning: Deleting a share will also delete all files and directories that are contained in it.
+    async def file_delete_samples(self, sharename, filename, service):
+        print('\nDeleting all samples created for this demonstration.')
+
+        try:
+            print('Deleting sample share ' + sharename + ' and all files and directories under it.')
+            await service.delete_share(sharename)
+            print('Sample share "' + sharename + '" deleted.')
+
+            print('\nCompleted successfully - Azure Files samples deleted.')
+
+        except Exception as e:
+            print('********ErrorDelete***********')
+            print(e)
+
+    async def _bounded(self, semaphore, coroutine):
+        async with semaphore:
+            return await coroutine
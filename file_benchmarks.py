@@ -0,0 +1,520 @@
+#-------------------------------------------------------------------------
+# Microsoft Developer & Platform Evangelism
+#
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# THIS CODE AND INFORMATION ARE PROVIDED "AS IS" WITHOUT WARRANTY OF ANY KIND,
+# EITHER EXPRESSED OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND/OR FITNESS FOR A PARTICULAR PURPOSE.
+#----------------------------------------------------------------------------------
+# The example companies, organizations, products, domain names,
+# e-mail addresses, logos, people, places, and events depicted
+# herein are fictitious. No association with any real company,
+# organization, product, domain name, email address, logo, person,
+# places, or events is intended or should be inferred.
+#--------------------------------------------------------------------------
+
+# Benchmark suite for the sample operations.
+#
+# By default the cases run against the in-process fakes in fake_file_service.py, so no storage
+# account is needed, with a simulated latency per call and bandwidth per transfer:
+#   python file_benchmarks.py --latency-ms 20 --bandwidth-mbps 200 --output results.json
+# Pass --connection-string to run the same cases against a storage account instead; the latency
+# and bandwidth options then have no effect. Azurite does not emulate the File service, so the
+# in-process fake is the local stand-in.
+#
+# Every case reports ops/s, MB/s and p50/p99 latency per operation as JSON, written to stdout or
+# --output; progress lines go to stderr, so a redirected report can be used as a baseline.
+# With --baseline the run exits with status 1 when a case is slower than the baseline by more
+# than --tolerance, so performance regressions can fail a build before deploy.
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bulk_operations import BulkOperations
+from concurrency_governor import ConcurrencyGovernor
+from copy_manager import CopyManager
+from dedupe_upload import DedupeUploader
+from delta_sync import DeltaSync
+from directory_walker import ShareTreeWalker
+from fake_file_service import FakeShareServiceClient
+from file_transfer import MAX_RANGE_SIZE, ParallelFileUploader, ParallelFileDownloader, split_ranges
+from random_data import RandomData
+from share_listing import ShareLister
+
+MB = 1024 * 1024
+
+
+# Returns the pct percentile of values using the nearest-rank method.
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+# Collects the latency and bytes moved of every operation of one benchmark case.
+# Rates are computed over the span from the start of the first operation to the end of
+# the last one, so setup work done by a case is not counted.
+class BenchmarkRecorder():
+
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.transferred = 0
+        self.extra = {}
+        self._lock = threading.Lock()
+        self._first_start = None
+        self._last_end = None
+
+    def record(self, start, end, transferred=0):
+        with self._lock:
+            self.latencies.append(end - start)
+            self.transferred += transferred
+            self._first_start = start if self._first_start is None else min(self._first_start, start)
+            self._last_end = end if self._last_end is None else max(self._last_end, end)
+
+    # Runs operation, records how long it took and returns its result.
+    def time(self, operation, transferred=0):
+        start = time.perf_counter()
+        result = operation()
+        self.record(start, time.perf_counter(), transferred)
+        return result
+
+    def result(self):
+        elapsed = (self._last_end - self._first_start) if self.latencies else 0
+        elapsed = elapsed or 1e-9
+        result = {
+            'name': self.name,
+            'ops': len(self.latencies),
+            'seconds': round(elapsed, 4),
+            'ops_per_s': round(len(self.latencies) / elapsed, 2),
+            'mb_per_s': round(self.transferred / MB / elapsed, 2),
+            'p50_ms': round(percentile(self.latencies, 50) * 1000, 3),
+            'p99_ms': round(percentile(self.latencies, 99) * 1000, 3),
+        }
+        result.update(self.extra)
+        return result
+
+
+# Wraps a client so that every call to one of the named methods is recorded as an operation.
+class _TimedClient():
+
+    def __init__(self, client, recorder, methods):
+        self._client = client
+        self._recorder = recorder
+        self._methods = methods
+
+    def __getattr__(self, name):
+        attribute = getattr(self._client, name)
+        if name not in self._methods:
+            return attribute
+        return lambda *args, **kwargs: self._recorder.time(lambda: attribute(*args, **kwargs))
+
+
+# Returns the resident set size of this process in bytes, or None where /proc is not available.
+def current_rss():
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+# Samples the resident set size from a background thread while in use, and keeps the largest
+# growth over its size at entry in peak_growth, which stays None where it cannot be read.
+class RssSampler():
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak_growth = None
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        start = current_rss()
+        if start is not None:
+            self.peak_growth = 0
+
+            def sample():
+                while not self._stop.wait(self.interval):
+                    self.peak_growth = max(self.peak_growth, current_rss() - start)
+            self._thread = threading.Thread(target=sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        if self.peak_growth is not None:
+            self._thread.join()
+
+
+# Writes size random bytes to a new temporary file, streaming them in chunks, and returns its path.
+def write_random_file(size, seed=None):
+    with tempfile.NamedTemporaryFile(delete=False) as random_file:
+        for chunk in RandomData(seed).iter_random_chunks(size):
+            random_file.write(chunk)
+    return random_file.name
+
+
+# Builds a tree of the given depth under directory_client, with fanout subdirectories and
+# files_per_directory empty files in every directory. Returns the number of entries created.
+def build_tree(directory_client, depth, fanout, files_per_directory):
+    count = 0
+    for index in range(files_per_directory):
+        directory_client.get_file_client('file' + str(index)).create_file(0)
+        count += 1
+    if depth > 0:
+        for index in range(fanout):
+            subdirectory_client = directory_client.create_subdirectory('dir' + str(index))
+            count += 1 + build_tree(subdirectory_client, depth - 1, fanout, files_per_directory)
+    return count
+
+
+#
+# Shared state of a benchmark run: the service under test, a scratch share and a local
+# source file of the configured size, created once and reused by the cases.
+#
+class BenchmarkContext():
+
+    def __init__(self, options):
+        self.options = options
+        self.size = int(options.size_mb * MB)
+        if options.connection_string:
+            from client_factory import get_client_factory
+            self.service = get_client_factory(options.connection_string).get_service_client()
+        else:
+            bandwidth = options.bandwidth_mbps * MB / 8 if options.bandwidth_mbps else None
+            copy_bandwidth = options.copy_mbps * MB / 8 if options.copy_mbps else None
+            self.service = FakeShareServiceClient(latency=options.latency_ms / 1000.0, bandwidth=bandwidth,
+                                                  copy_bandwidth=copy_bandwidth)
+
+        self.share_name = 'benchmark' + RandomData().get_random_name(8)
+        self.share_client = self.service.create_share(share_name=self.share_name)
+        self.source_path = write_random_file(self.size, seed=1)
+        self._remote_file = None
+
+    # Returns a file client holding a copy of the local source file, uploaded on first use.
+    def remote_file(self):
+        if self._remote_file is None:
+            self._remote_file = self.share_client.get_file_client('source.bin')
+            ParallelFileUploader(max_workers=8).upload(self._remote_file, self.source_path)
+        return self._remote_file
+
+    def close(self):
+        os.remove(self.source_path)
+        try:
+            self.service.delete_share(self.share_name)
+        except Exception as e:
+            print('Could not delete benchmark share ' + self.share_name + ':', e, file=sys.stderr)
+
+
+def case_random_data(context, recorder, workers):
+    for _, length in split_ranges(context.size, MAX_RANGE_SIZE):
+        recorder.time(lambda: RandomData().get_random_bytes(length), length)
+
+
+def case_upload(context, recorder, workers):
+    uploader = ParallelFileUploader(max_workers=workers)
+    for iteration in range(context.options.iterations):
+        file_client = context.share_client.get_file_client('upload' + str(workers) + '_' + str(iteration))
+        recorder.time(lambda: uploader.upload(file_client, context.source_path), context.size)
+
+
+def case_download(context, recorder, workers):
+    file_client = context.remote_file()
+    downloader = ParallelFileDownloader(max_workers=workers)
+    destination_path = context.source_path + '.download'
+    try:
+        with RssSampler() as sampler:
+            for _ in range(context.options.iterations):
+                recorder.time(lambda: downloader.download(file_client, destination_path), context.size)
+    finally:
+        os.remove(destination_path)
+
+    # Each worker maps and buffers one range at a time, so the growth must not depend on the file size
+    if sampler.peak_growth is not None:
+        recorder.extra['peak_rss_mb'] = round(sampler.peak_growth / MB, 2)
+        limit = 4 * workers * MAX_RANGE_SIZE + 64 * MB
+        assert sampler.peak_growth <= limit, 'download grew the RSS by ' + str(sampler.peak_growth // MB) + ' MiB'
+
+
+# Every upload_range call is one operation; ranges are sent from a pool of workers.
+def case_range_upload(context, recorder, workers):
+    file_client = context.share_client.get_file_client('ranges' + str(workers))
+    file_client.create_file(context.size)
+
+    def upload_range(file_range):
+        offset, length = file_range
+        with open(context.source_path, 'rb') as source_file:
+            source_file.seek(offset)
+            data = source_file.read(length)
+        recorder.time(lambda: file_client.upload_range(data, offset, length), length)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(upload_range, split_ranges(context.size, MAX_RANGE_SIZE)))
+
+
+# Each operation is a delta sync after a few bytes of the local file changed.
+def case_delta_sync(context, recorder, workers):
+    manifest_dir = tempfile.mkdtemp()
+    source_path = write_random_file(context.size, seed=2)
+    try:
+        file_client = context.share_client.get_file_client('delta' + str(workers))
+        delta_sync = DeltaSync(manifest_dir, max_workers=workers)
+        delta_sync.sync(file_client, source_path)
+
+        for iteration in range(context.options.iterations):
+            with open(source_path, 'r+b') as source_file:
+                source_file.seek((iteration * 7 * delta_sync.block_size) % context.size)
+                source_file.write(RandomData().get_random_bytes(1024))
+            stats = recorder.time(lambda: delta_sync.sync(file_client, source_path))
+            recorder.transferred += stats['uploaded']
+    finally:
+        os.remove(source_path)
+        for name in os.listdir(manifest_dir):
+            os.remove(os.path.join(manifest_dir, name))
+        os.rmdir(manifest_dir)
+
+
+# Each operation is a server-side copy of the source file, started and polled until it completes.
+def case_copy(context, recorder, workers):
+    source_client = context.remote_file()
+
+    def copy(index):
+        destination_client = context.share_client.get_file_client('copy' + str(workers) + '_' + str(index))
+
+        def start_and_wait():
+            status = destination_client.start_copy_from_url(source_client.url)['copy_status']
+            while status == 'pending':
+                time.sleep(0.1)
+                status = destination_client.get_file_properties()['copy']['status']
+            return status
+
+        recorder.time(start_and_wait, context.size)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(copy, range(context.options.copies)))
+
+
+# The single operation is a batch of server-side copies handed to a CopyManager, which polls
+# them all from one scheduler loop with workers copies in flight.
+def case_copy_batch(context, recorder, workers):
+    source_client = context.remote_file()
+    manager = CopyManager(max_in_flight=workers, max_workers=workers, poll_interval=0.1)
+    pairs = [(source_client, context.share_client.get_file_client('batch' + str(workers) + '_' + str(index)))
+             for index in range(context.options.copies)]
+    results = recorder.time(lambda: manager.copy_files(pairs), context.size * len(pairs))
+    assert all(result.status == 'success' for result in results)
+    recorder.extra['copies_per_s'] = round(len(pairs) / recorder.latencies[0], 2)
+    recorder.extra['client_fallbacks'] = sum(1 for result in results if result.method == 'client')
+
+
+# The single operation stores --copies copies of the source file through a DedupeUploader with
+# an empty index: the content is uploaded once and server-side copied to the other paths.
+def case_dedupe_upload(context, recorder, workers):
+    index_path = context.source_path + '.index'
+    dedupe = DedupeUploader(index_path, uploader=ParallelFileUploader(max_workers=workers),
+                            copy_manager=CopyManager(max_in_flight=workers, max_workers=workers, poll_interval=0.1, fallback=False))
+    pairs = [(context.share_client.get_file_client('dedupe' + str(workers) + '_' + str(index)), context.source_path)
+             for index in range(context.options.copies)]
+    try:
+        results = recorder.time(lambda: dedupe.upload_files(pairs), context.size * len(pairs))
+    finally:
+        dedupe.close()
+        os.remove(index_path)
+    summary = DedupeUploader.summarize(results)
+    assert summary['failed'] == 0
+    recorder.extra['mb_saved'] = round(summary['bytes_saved'] / MB, 2)
+
+
+# Each operation is a recursive walk of a small tree.
+def case_list(context, recorder, workers):
+    directory_name = 'tree' + str(workers)
+    entries = build_tree(context.share_client.create_directory(directory_name), 2, 4, 10)
+    walker = ShareTreeWalker(max_workers=workers, results_per_page=10)
+
+    for _ in range(context.options.iterations):
+        listed = recorder.time(lambda: sum(1 for _ in walker.walk(context.share_client, directory_name)))
+        assert listed == entries
+    recorder.extra['entries'] = entries
+
+
+# Every get_file_properties and set_file_metadata call is one operation.
+def case_metadata(context, recorder, workers):
+    directory_client = context.share_client.create_directory('metadata' + str(workers))
+    file_clients = [directory_client.get_file_client('file' + str(index)) for index in range(context.options.files)]
+    for file_client in file_clients:
+        file_client.create_file(0)
+
+    def read_and_write(indexed_client):
+        index, file_client = indexed_client
+        recorder.time(file_client.get_file_properties)
+        recorder.time(lambda: file_client.set_file_metadata({'index': str(index)}))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(read_and_write, enumerate(file_clients)))
+
+
+# Every create_share and delete_share call made by BulkOperations is one operation.
+def case_share_lifecycle(context, recorder, workers):
+    service = _TimedClient(context.service, recorder, ('create_share', 'delete_share'))
+    share_names = [context.share_name + 'x' + str(workers) + 'x' + str(index) for index in range(context.options.files)]
+    bulk = BulkOperations(max_workers=workers)
+    results = bulk.create_shares(service, share_names) + bulk.delete_shares(service, share_names)
+    assert all(result.succeeded for result in results)
+
+
+# Every page of a prefix-filtered share listing is one operation.
+def case_share_listing(context, recorder, workers):
+    prefix = context.share_name + 'list'
+    share_names = [prefix + str(index) for index in range(context.options.files)]
+    bulk = BulkOperations(max_workers=16)
+    assert all(result.succeeded for result in bulk.create_shares(context.service, share_names))
+    try:
+        lister = ShareLister(results_per_page=10)
+        for _ in range(context.options.iterations):
+            token = None
+            while True:
+                page = recorder.time(lambda: lister.get_page(context.service, prefix, token))
+                token = page.continuation_token
+                if not token:
+                    break
+    finally:
+        bulk.delete_shares(context.service, share_names)
+
+
+# The single operation is the creation of --files files by BulkOperations through a
+# ConcurrencyGovernor, with the fake service throttled to --throttle-rps requests per second.
+def case_throttled_bulk(context, recorder, workers):
+    directory_name = 'throttled' + str(workers)
+    context.share_client.create_directory(directory_name)
+    file_paths = [directory_name + '/file' + str(index) for index in range(context.options.files)]
+    governor = ConcurrencyGovernor(initial_limit=1, max_limit=workers, backoff_base=0.05)
+    bulk = BulkOperations(max_workers=workers, governor=governor)
+
+    throttled_service = None if context.options.connection_string else context.service
+    if throttled_service is not None:
+        throttled_service.throttle_rate = context.options.throttle_rps
+    try:
+        results = recorder.time(lambda: bulk.create_files(context.share_client, file_paths))
+    finally:
+        if throttled_service is not None:
+            throttled_service.throttle_rate = None
+    assert all(result.succeeded for result in results)
+    recorder.extra['files_per_s'] = round(len(file_paths) / recorder.latencies[0], 2)
+    recorder.extra.update(('governor_' + name, value) for name, value in governor.stats().items())
+
+
+# Benchmark cases by name; the flag tells whether the case is repeated for every worker count.
+CASES = [
+    ('random_data', case_random_data, False),
+    ('upload', case_upload, True),
+    ('download', case_download, True),
+    ('range_upload', case_range_upload, True),
+    ('delta_sync', case_delta_sync, True),
+    ('copy', case_copy, True),
+    ('copy_batch', case_copy_batch, True),
+    ('dedupe_upload', case_dedupe_upload, True),
+    ('list', case_list, True),
+    ('metadata', case_metadata, True),
+    ('share_lifecycle', case_share_lifecycle, True),
+    ('share_listing', case_share_listing, False),
+    ('throttled_bulk', case_throttled_bulk, True),
+]
+
+
+def run_benchmarks(options):
+    selected = options.cases.split(',') if options.cases else [name for name, _, _ in CASES]
+    context = BenchmarkContext(options)
+    results = []
+    try:
+        for name, case, uses_workers in CASES:
+            if name not in selected:
+                continue
+            for workers in (options.workers if uses_workers else [1]):
+                label = name + '[workers=' + str(workers) + ']' if uses_workers else name
+                recorder = BenchmarkRecorder(label)
+                case(context, recorder, workers)
+                result = recorder.result()
+                results.append(result)
+                print('  {:<28} {:>10.1f} ops/s {:>10.1f} MB/s  p50 {:>9.2f} ms  p99 {:>9.2f} ms'.format(
+                    label, result['ops_per_s'], result['mb_per_s'], result['p50_ms'], result['p99_ms']), file=sys.stderr)
+    finally:
+        context.close()
+
+    return {
+        'config': {
+            'target': 'connection-string' if options.connection_string else 'fake',
+            'latency_ms': options.latency_ms,
+            'bandwidth_mbps': options.bandwidth_mbps,
+            'copy_mbps': options.copy_mbps,
+            'size_mb': options.size_mb,
+            'iterations': options.iterations,
+        },
+        'results': results,
+    }
+
+
+# Returns a message for every case slower than the baseline by more than tolerance.
+def find_regressions(report, baseline, tolerance):
+    baseline_results = dict((result['name'], result) for result in baseline['results'])
+    regressions = []
+    for result in report['results']:
+        previous = baseline_results.get(result['name'])
+        if previous is None or not previous['ops_per_s']:
+            continue
+        if result['ops_per_s'] < previous['ops_per_s'] * (1 - tolerance):
+            regressions.append('{}: {} ops/s, baseline {} ops/s'.format(result['name'], result['ops_per_s'], previous['ops_per_s']))
+    return regressions
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks for the Azure Files sample operations.')
+    parser.add_argument('--connection-string', help='run against this storage account instead of the in-process fake')
+    parser.add_argument('--latency-ms', type=float, default=5.0, help='simulated latency of every fake service call')
+    parser.add_argument('--bandwidth-mbps', type=float, default=0, help='simulated bandwidth of every fake transfer, 0 for unlimited')
+    parser.add_argument('--copy-mbps', type=float, default=0, help='simulated progress rate of fake server-side copies, 0 to complete them at once')
+    parser.add_argument('--throttle-rps', type=float, default=1000, help='requests per second the fake service accepts in the throttled case')
+    parser.add_argument('--size-mb', type=float, default=32, help='size of the transferred file')
+    parser.add_argument('--iterations', type=int, default=3, help='repetitions of the whole-file operations')
+    parser.add_argument('--copies', type=int, default=20, help='number of server-side copies in the copy cases')
+    parser.add_argument('--files', type=int, default=50, help='number of files or shares in the metadata and share cases')
+    parser.add_argument('--workers', type=lambda value: [int(count) for count in value.split(',')], default=[1, 8],
+                        help='comma separated worker counts to run each case with')
+    parser.add_argument('--cases', help='comma separated case names, all by default: ' + ', '.join(name for name, _, _ in CASES))
+    parser.add_argument('--output', help='write the JSON report to this file instead of stdout')
+    parser.add_argument('--baseline', help='JSON report to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed ops/s drop relative to the baseline')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_arguments(argv)
+    report = run_benchmarks(options)
+
+    if options.output:
+        with open(options.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+        print('Report written to ' + options.output, file=sys.stderr)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if options.baseline:
+        with open(options.baseline) as baseline_file:
+            regressions = find_regressions(report, json.load(baseline_file), options.tolerance)
+        for regression in regressions:
+            print('REGRESSION ' + regression, file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
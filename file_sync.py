@@ -0,0 +1,487 @@
+#-------------------------------------------------------------------------
+# Microsoft Developer & Platform Evangelism
+#
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# THIS CODE AND INFORMATION ARE PROVIDED "AS IS" WITHOUT WARRANTY OF ANY KIND,
+# EITHER EXPRESSED OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND/OR FITNESS FOR A PARTICULAR PURPOSE.
+#----------------------------------------------------------------------------------
+# The example companies, organizations, products, domain names,
+# e-mail addresses, logos, people, places, and events depicted
+# herein are fictitious. No association with any real company,
+# organization, product, domain name, email address, logo, person,
+# places, or events is intended or should be inferred.
+#--------------------------------------------------------------------------
+
+# Mirrors a local directory tree into an Azure file share, or a share directory back to disk:
+#   python file_sync.py upload LOCAL_DIR SHARE [--remote-dir DIR]
+#   python file_sync.py download LOCAL_DIR SHARE [--remote-dir DIR]
+# The storage account is taken from config.py unless --connection-string is given.
+#
+# Every file synced is recorded in a SQLite manifest with its size and modification time, so
+# a later run, or a run restarted after a crash, skips the files that have not changed since
+# without making any request for them. Run `python file_sync.py --help` for the options.
+
+import argparse
+import hashlib
+import os
+import queue
+import sqlite3
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from directory_walker import ShareTreeWalker
+from file_transfer import MAX_RANGE_SIZE, ParallelFileDownloader, ParallelFileUploader
+
+# Error codes returned when creating a share or directory that already exists
+ALREADY_EXISTS_ERRORS = ('ShareAlreadyExists', 'ResourceAlreadyExists')
+
+
+#
+# SQLite record of the files a sync has completed, keyed by their path relative to the
+# synced directory.
+#
+# Changes are committed every commit_interval records rather than one by one, so a crash
+# loses at most that many records and those files are transferred again by the next run.
+#
+class SyncManifest():
+
+    def __init__(self, path, commit_interval=1000):
+        self.commit_interval = commit_interval
+        self._connection = sqlite3.connect(path)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.execute('CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL)')
+        self._connection.execute('CREATE TABLE IF NOT EXISTS directories (path TEXT PRIMARY KEY)')
+        self._connection.commit()
+        self._uncommitted = 0
+
+    # Returns True if path was synced with this size and local modification time.
+    def is_synced(self, path, size, mtime_ns):
+        row = self._connection.execute('SELECT size, mtime_ns FROM files WHERE path = ?', (path,)).fetchone()
+        return row is not None and row[0] == size and row[1] == mtime_ns
+
+    def has_directory(self, path):
+        return self._connection.execute('SELECT 1 FROM directories WHERE path = ?', (path,)).fetchone() is not None
+
+    def record_file(self, path, size, mtime_ns):
+        self._connection.execute('INSERT OR REPLACE INTO files (path, size, mtime_ns) VALUES (?, ?, ?)', (path, size, mtime_ns))
+        self._changed()
+
+    def record_directory(self, path):
+        self._connection.execute('INSERT OR IGNORE INTO directories (path) VALUES (?)', (path,))
+        self._changed()
+
+    def commit(self):
+        self._connection.commit()
+        self._uncommitted = 0
+
+    def close(self):
+        self.commit()
+        self._connection.close()
+
+    def _changed(self):
+        self._uncommitted += 1
+        if self._uncommitted >= self.commit_interval:
+            self.commit()
+
+
+#
+# Resumable one-way sync between a local directory tree and a share directory.
+#
+# The source tree is walked lazily and every file is checked against the manifest, so
+# unchanged files cost a local stat and an index lookup. New and changed files go through a
+# pipeline with one lane per file size:
+#  - Small files are grouped in batches. Reading the files of a batch from disk runs on its
+#    own threads while the files of earlier batches are being sent, and at most
+#    max_pending_batches batches are held in memory at a time.
+#  - Large files are transferred one at a time as parallel ranges with ParallelFileUploader
+#    or ParallelFileDownloader, alongside the small file batches.
+# Each file is recorded in the manifest as soon as it completes. The manifests are kept in
+# manifest_dir, one per direction, local directory and share directory.
+#
+# Files deleted from the source are not deleted from the destination. In the download
+# direction the directory listing only reports the size of remote files, so a remote file
+# rewritten with the same size is not noticed until its local copy changes.
+#
+class DirectorySync():
+
+    # Input Arguments:
+    # manifest_dir - local directory holding the SQLite manifests
+    # max_workers - number of small files sent or fetched concurrently
+    # read_workers - number of threads reading small files from or writing them to disk
+    # small_file_size - files up to this size are batched, larger ones are transferred in ranges
+    # batch_files - maximum number of files in a batch
+    # batch_bytes - maximum total size of the files in a batch
+    # max_pending_batches - number of batches in the pipeline at the same time, bounding memory use
+    # range_workers - number of ranges of a large file transferred concurrently
+    # range_size - size of each range of a large file
+    def __init__(self, manifest_dir, max_workers=16, read_workers=4, small_file_size=MAX_RANGE_SIZE, batch_files=64,
+                 batch_bytes=16 * 1024 * 1024, max_pending_batches=4, range_workers=8, range_size=MAX_RANGE_SIZE):
+        if max_workers < 1 or read_workers < 1 or range_workers < 1:
+            raise ValueError('max_workers, read_workers and range_workers must be at least 1.')
+        if small_file_size <= 0 or small_file_size > MAX_RANGE_SIZE:
+            raise ValueError('small_file_size must be between 1 and ' + str(MAX_RANGE_SIZE) + ' bytes.')
+        self.manifest_dir = manifest_dir
+        self.max_workers = max_workers
+        self.read_workers = read_workers
+        self.small_file_size = small_file_size
+        self.batch_files = batch_files
+        self.batch_bytes = batch_bytes
+        self.max_pending_batches = max_pending_batches
+        self.range_workers = range_workers
+        self.range_size = range_size
+
+    # Uploads the new and changed files under local_dir to remote_dir of share_client,
+    # creating the directories they need. Returns the statistics of the run as a dict.
+    def upload(self, local_dir, share_client, remote_dir=''):
+        remote_dir = remote_dir.strip('/')
+        run = _SyncRun(self, self._open_manifest('upload', local_dir, share_client, remote_dir))
+        uploader = ParallelFileUploader(chunk_size=self.range_size, max_workers=self.range_workers)
+        excluded = os.path.abspath(self.manifest_dir)
+
+        def send_small(entry, data):
+            run.wait_for_directory(entry.remote_directory)
+            share_client.get_file_client(entry.remote_path).upload_file(data)
+
+        def send_large(entry):
+            run.wait_for_directory(entry.remote_directory)
+            uploader.upload(share_client.get_file_client(entry.remote_path), entry.local_path)
+
+        with run:
+            for relative_path, local_path, size, mtime_ns in _scan_local(local_dir, excluded):
+                run.stats['files'] += 1
+                if run.manifest.is_synced(relative_path, size, mtime_ns):
+                    run.stats['skipped'] += 1
+                    continue
+                remote_path = remote_dir + '/' + relative_path if remote_dir else relative_path
+                entry = _SyncEntry(relative_path, local_path, remote_path, size, mtime_ns)
+                run.ensure_directory(share_client, entry.remote_directory)
+                if size <= self.small_file_size:
+                    run.add_small(entry, _read_file, send_small, fetch_locally=True)
+                else:
+                    run.add_large(entry, send_large)
+        return run.stats
+
+    # Downloads the new and changed files under remote_dir of share_client into local_dir.
+    # Returns the statistics of the run as a dict.
+    def download(self, local_dir, share_client, remote_dir=''):
+        remote_dir = remote_dir.strip('/')
+        run = _SyncRun(self, self._open_manifest('download', local_dir, share_client, remote_dir))
+        downloader = ParallelFileDownloader(chunk_size=self.range_size, max_workers=self.range_workers)
+
+        def fetch_small(entry):
+            return share_client.get_file_client(entry.remote_path).download_file().readall()
+
+        def write_small(entry, data):
+            partial_path = _partial_path(entry.local_path)
+            with open(partial_path, 'wb') as local_file:
+                local_file.write(data)
+            _replace(partial_path, entry)
+
+        def fetch_large(entry):
+            partial_path = _partial_path(entry.local_path)
+            downloader.download(share_client.get_file_client(entry.remote_path), partial_path)
+            _replace(partial_path, entry)
+
+        with run:
+            walker = ShareTreeWalker(max_workers=self.read_workers)
+            for item in walker.walk(share_client, remote_dir):
+                relative_path = item['path'][len(remote_dir) + 1:] if remote_dir else item['path']
+                local_path = os.path.join(local_dir, *relative_path.split('/'))
+                if item['is_directory']:
+                    if not os.path.isdir(local_path):
+                        os.makedirs(local_path)
+                    continue
+
+                run.stats['files'] += 1
+                size = item['size']
+                try:
+                    stat = os.stat(local_path)
+                    if stat.st_size == size and run.manifest.is_synced(relative_path, size, stat.st_mtime_ns):
+                        run.stats['skipped'] += 1
+                        continue
+                except OSError:
+                    pass
+                entry = _SyncEntry(relative_path, local_path, item['path'], size, None)
+                if size <= self.small_file_size:
+                    run.add_small(entry, fetch_small, write_small, fetch_locally=False)
+                else:
+                    run.add_large(entry, fetch_large)
+        return run.stats
+
+    def _open_manifest(self, direction, local_dir, share_client, remote_dir):
+        if not os.path.isdir(self.manifest_dir):
+            os.makedirs(self.manifest_dir)
+        key = '\n'.join([direction, os.path.abspath(local_dir), share_client.url, remote_dir])
+        name = hashlib.sha1(key.encode('utf-8')).hexdigest() + '.sqlite'
+        return SyncManifest(os.path.join(self.manifest_dir, name))
+
+
+# A file to be synced. mtime_ns is the local modification time when the file was scanned,
+# or None when it is downloaded and only known once written.
+class _SyncEntry():
+
+    __slots__ = ('relative_path', 'local_path', 'remote_path', 'size', 'mtime_ns')
+
+    def __init__(self, relative_path, local_path, remote_path, size, mtime_ns):
+        self.relative_path = relative_path
+        self.local_path = local_path
+        self.remote_path = remote_path
+        self.size = size
+        self.mtime_ns = mtime_ns
+
+    @property
+    def remote_directory(self):
+        return self.remote_path.rpartition('/')[0]
+
+
+# State of a single sync: the thread pools of the pipeline, the batch being filled, and the
+# queue through which completed files are passed back to the calling thread, which is the
+# only one using the manifest.
+class _SyncRun():
+
+    def __init__(self, sync, manifest):
+        self.sync = sync
+        self.manifest = manifest
+        self.stats = {'files': 0, 'skipped': 0, 'transferred': 0, 'failed': 0, 'bytes': 0, 'errors': []}
+        self.completed = queue.Queue()
+        self.batch = []
+        self.batch_size = 0
+        self.pending_batches = threading.BoundedSemaphore(sync.max_pending_batches)
+        # Holds at most one large file waiting behind the one being transferred
+        self.pending_large = threading.BoundedSemaphore(2)
+        self.directories = {}
+
+    def __enter__(self):
+        self.network = ThreadPoolExecutor(max_workers=self.sync.max_workers)
+        self.local = ThreadPoolExecutor(max_workers=self.sync.read_workers)
+        self.large = ThreadPoolExecutor(max_workers=1)
+        return self
+
+    def __exit__(self, *exc_info):
+        try:
+            if exc_info[0] is None:
+                self._submit_batch()
+            # The fetches of a batch hand their files over to the other pool, so every batch must be
+            # finished before either pool is shut down; holding all the permits means none is left
+            for _ in range(self.sync.max_pending_batches):
+                self._acquire(self.pending_batches)
+            for executor in (self.large, self.local, self.network):
+                executor.shutdown(wait=True)
+            self._drain()
+            accounted = self.stats['transferred'] + self.stats['skipped'] + self.stats['failed']
+            if exc_info[0] is None and accounted != self.stats['files']:
+                raise RuntimeError('Sync accounted for ' + str(accounted) + ' of ' + str(self.stats['files']) + ' files.')
+        finally:
+            self.manifest.close()
+
+    # Creates the remote directory and its parents, unless the manifest already has them.
+    # The creation runs on the network pool ahead of the files submitted after it.
+    def ensure_directory(self, share_client, path):
+        if not path or path in self.directories:
+            return
+        if self.manifest.has_directory(path):
+            self.directories[path] = None
+            return
+        parent = path.rpartition('/')[0]
+        self.ensure_directory(share_client, parent)
+
+        def create():
+            self.wait_for_directory(parent)
+            try:
+                share_client.create_directory(path)
+            except Exception as e:
+                if getattr(e, 'error_code', None) not in ALREADY_EXISTS_ERRORS:
+                    raise
+            self.completed.put(('directory', path, None))
+
+        self.directories[path] = self.network.submit(create)
+
+    # Blocks a worker until the remote directory exists; raises if it could not be created.
+    def wait_for_directory(self, path):
+        future = self.directories.get(path)
+        if future is not None:
+            future.result()
+
+    # Adds a small file to the current batch. The batch first runs fetch on every file, on the
+    # local pool if fetch_locally is set and on the network pool otherwise, then store on the other.
+    def add_small(self, entry, fetch, store, fetch_locally):
+        self.batch.append((entry, fetch, store, fetch_locally))
+        self.batch_size += entry.size
+        if len(self.batch) >= self.sync.batch_files or self.batch_size >= self.sync.batch_bytes:
+            self._submit_batch()
+
+    def add_large(self, entry, transfer):
+        self._acquire(self.pending_large)
+
+        def run():
+            try:
+                transfer(entry)
+                self._done(entry, None)
+            except Exception as e:
+                self._done(entry, e)
+            finally:
+                self.pending_large.release()
+
+        self.large.submit(run)
+
+    def _submit_batch(self):
+        if not self.batch:
+            return
+        batch, self.batch, self.batch_size = self.batch, [], 0
+        self._acquire(self.pending_batches)
+        remaining = [len(batch)]
+        lock = threading.Lock()
+
+        def finish(entry, error):
+            self._done(entry, error)
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                self.pending_batches.release()
+
+        def store(entry, store_file, data):
+            try:
+                store_file(entry, data)
+                finish(entry, None)
+            except Exception as e:
+                finish(entry, e)
+
+        def fetch(entry, fetch_file, store_file, fetch_locally):
+            try:
+                data = fetch_file(entry)
+            except Exception as e:
+                finish(entry, e)
+                return
+            try:
+                (self.network if fetch_locally else self.local).submit(store, entry, store_file, data)
+            except Exception as e:
+                finish(entry, e)
+
+        if batch[0][3]:
+            # Local reads of a batch run back to back on one thread, ahead of the network writes
+            def read_batch():
+                for item in batch:
+                    fetch(*item)
+            self.local.submit(read_batch)
+        else:
+            for item in batch:
+                self.network.submit(fetch, *item)
+
+    # Waits for the semaphore, recording completed files in the meantime.
+    def _acquire(self, semaphore):
+        while not semaphore.acquire(timeout=0.1):
+            self._drain()
+        self._drain()
+
+    def _done(self, entry, error):
+        self.completed.put(('file', entry, error))
+
+    def _drain(self):
+        while True:
+            try:
+                kind, item, error = self.completed.get_nowait()
+            except queue.Empty:
+                return
+            if kind == 'directory':
+                self.manifest.record_directory(item)
+            elif error is not None:
+                self.stats['failed'] += 1
+                self.stats['errors'].append((item.relative_path, error))
+            else:
+                self.stats['transferred'] += 1
+                self.stats['bytes'] += item.size
+                self.manifest.record_file(item.relative_path, item.size, item.mtime_ns)
+
+
+# Yields (relative path, local path, size, modification time in ns) for every file under
+# local_dir, without descending into the excluded directory or following directory links.
+def _scan_local(local_dir, excluded=None):
+    pending = ['']
+    while pending:
+        relative_dir = pending.pop()
+        directory_path = os.path.join(local_dir, *relative_dir.split('/')) if relative_dir else local_dir
+        with os.scandir(directory_path) as entries:
+            for entry in entries:
+                relative_path = relative_dir + '/' + entry.name if relative_dir else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    if os.path.abspath(entry.path) != excluded:
+                        pending.append(relative_path)
+                elif entry.is_file():
+                    stat = entry.stat()
+                    yield relative_path, entry.path, stat.st_size, stat.st_mtime_ns
+
+
+def _read_file(entry):
+    with open(entry.local_path, 'rb') as local_file:
+        return local_file.read()
+
+
+def _partial_path(local_path):
+    directory = os.path.dirname(local_path)
+    if directory and not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            # Created by another worker meanwhile
+            if not os.path.isdir(directory):
+                raise
+    return local_path + '.partial'
+
+
+# Moves a completed download into place and records its local modification time.
+def _replace(partial_path, entry):
+    os.replace(partial_path, entry.local_path)
+    entry.mtime_ns = os.stat(entry.local_path).st_mtime_ns
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description='Mirror a local directory tree into an Azure file share, or back.')
+    parser.add_argument('direction', choices=['upload', 'download'], help='upload from LOCAL_DIR to the share, or download into it')
+    parser.add_argument('local_dir', help='local directory to sync')
+    parser.add_argument('share', help='name of the file share')
+    parser.add_argument('--remote-dir', default='', help='directory of the share to sync, the share root by default')
+    parser.add_argument('--connection-string', help='storage account to use instead of the one in config.py')
+    parser.add_argument('--manifest-dir', default=os.path.join(os.path.expanduser('~'), '.azure_file_sync'),
+                        help='directory holding the sync manifests')
+    parser.add_argument('--workers', type=int, default=16, help='number of small files transferred concurrently')
+    parser.add_argument('--transfer-profile', metavar='NAME',
+                        help='transfer profile setting the range size, range workers and connection pool (see transfer_profiles.py)')
+    parser.add_argument('--range-workers', type=int, help='number of ranges of a large file transferred concurrently, '
+                                                          'the concurrency of the transfer profile by default')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_arguments(argv)
+    from client_factory import get_client_factory
+    from transfer_profiles import select_profile
+    profile = select_profile(options.transfer_profile)
+    share_client = get_client_factory(options.connection_string).get_share_client(options.share)
+    sync = DirectorySync(options.manifest_dir, max_workers=options.workers, range_workers=options.range_workers or profile.max_concurrency,
+                         range_size=profile.chunk_size)
+
+    if options.direction == 'upload':
+        try:
+            share_client.create_share()
+        except Exception as e:
+            if getattr(e, 'error_code', None) not in ALREADY_EXISTS_ERRORS:
+                raise
+        stats = sync.upload(options.local_dir, share_client, options.remote_dir)
+    else:
+        if not os.path.isdir(options.local_dir):
+            os.makedirs(options.local_dir)
+        stats = sync.download(options.local_dir, share_client, options.remote_dir)
+
+    print('{files} files: {transferred} transferred ({bytes} bytes), {skipped} unchanged, {failed} failed'.format(**stats))
+    for path, error in stats['errors']:
+        print('  ' + path + ':', error)
+    return 1 if stats['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
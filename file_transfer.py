@@ -0,0 +1,206 @@
+#-------------------------------------------------------------------------
+# Microsoft Developer & Platform Evangelism
+#
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# THIS CODE AND INFORMATION ARE PROVIDED "AS IS" WITHOUT WARRANTY OF ANY KIND,
+# EITHER EXPRESSED OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND/OR FITNESS FOR A PARTICULAR PURPOSE.
+#----------------------------------------------------------------------------------
+# The example companies, organizations, products, domain names,
+# e-mail addresses, logos, people, places, and events depicted
+# herein are fictitious. No association with any real company,
+# organization, product, domain name, email address, logo, person,
+# places, or events is intended or should be inferred.
+#--------------------------------------------------------------------------
+
+import mmap
+import os
+import threading
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+
+from concurrency_governor import governed_call, is_transient
+
+# Largest range accepted by a single Put Range call on Azure Files: 4 MiB
+MAX_RANGE_SIZE = 4 * 1024 * 1024
+
+
+# Splits a file of the given size into (offset, length) ranges of at most chunk_size bytes.
+def split_ranges(size, chunk_size=MAX_RANGE_SIZE):
+    for offset in range(0, size, chunk_size):
+        yield offset, min(chunk_size, size - offset)
+
+
+# Runs transfer(offset, length, stop) for every range on executor and returns the sum of the
+# results. Once a range fails for good, stop is set so the ranges being retried give up, the
+# ranges not started yet are cancelled, and its error is raised.
+def _transfer_ranges(executor, transfer, ranges):
+    stop = threading.Event()
+    futures = [executor.submit(transfer, offset, length, stop) for offset, length in ranges]
+    done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+    for future in done:
+        error = future.exception()
+        if error is not None:
+            stop.set()
+            for pending in futures:
+                pending.cancel()
+            raise error
+    return sum(future.result() for future in futures)
+
+
+# Calls operation, retrying transient errors up to max_retries times with an exponential
+# backoff starting at retry_backoff seconds, unless stop is set in the meantime.
+def _with_retries(operation, max_retries, retry_backoff, stop):
+    attempt = 0
+    while True:
+        try:
+            return operation()
+        except Exception as e:
+            attempt += 1
+            if attempt > max_retries or not is_transient(e) or stop.is_set():
+                raise
+            if stop.wait(retry_backoff * (2 ** (attempt - 1))):
+                raise
+
+
+#
+# Parallel chunked upload of a local file to Azure Files.
+#
+# The Azure file is created at its full size first, then the local file is split into
+# ranges of up to 4 MiB which are sent through ShareFileClient.upload_range from a
+# bounded thread pool. A range that fails with a transient error (see is_transient) is
+# retried on its own, so one such error does not restart the whole transfer; any other
+# error fails the upload at once and the ranges not sent yet are cancelled. With a
+# ConcurrencyGovernor the number of ranges in flight adapts to throttling, up to max_workers.
+#
+class ParallelFileUploader():
+
+    # Input Arguments:
+    # chunk_size - size of each uploaded range, at most MAX_RANGE_SIZE
+    # max_workers - number of ranges uploaded concurrently
+    # max_retries - number of times a range failing with a transient error is retried before giving up
+    # retry_backoff - initial wait in seconds between retries, doubled on every attempt
+    # governor - ConcurrencyGovernor limiting the requests in flight, possibly shared with other transfers
+    def __init__(self, chunk_size=MAX_RANGE_SIZE, max_workers=8, max_retries=3, retry_backoff=0.5, governor=None):
+        if chunk_size <= 0 or chunk_size > MAX_RANGE_SIZE:
+            raise ValueError('chunk_size must be between 1 and ' + str(MAX_RANGE_SIZE) + ' bytes.')
+        if max_workers < 1:
+            raise ValueError('max_workers must be at least 1.')
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.governor = governor
+
+    # Uploads the local file at source_path to file_client and returns the number of bytes sent.
+    # metadata - optional dict of metadata the Azure file is created with
+    def upload(self, file_client, source_path, metadata=None):
+        size = os.path.getsize(source_path)
+        file_client.create_file(size, metadata=metadata)
+        return self.upload_ranges(file_client, source_path, split_ranges(size, self.chunk_size))
+
+    # Uploads the given (offset, length) ranges of source_path to an existing file_client
+    # and returns the number of bytes sent. Ranges must not be larger than MAX_RANGE_SIZE.
+    def upload_ranges(self, file_client, source_path, ranges):
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return _transfer_ranges(executor, lambda offset, length, stop:
+                                    self._upload_range(file_client, source_path, offset, length, stop), ranges)
+
+    def _upload_range(self, file_client, source_path, offset, length, stop):
+        # Each range is read when its worker picks it up, so at most
+        # max_workers chunks are held in memory at any time.
+        with open(source_path, 'rb') as source_file:
+            source_file.seek(offset)
+            data = source_file.read(length)
+
+        _with_retries(lambda: governed_call(self.governor, file_client.upload_range, data=data, offset=offset, length=length),
+                      self.max_retries, self.retry_backoff, stop)
+        return length
+
+
+# File-like object that writes a downloaded range straight into a mapped region,
+# so StorageStreamDownloader.readinto fills the destination without staging copies.
+class _MappedRangeWriter():
+
+    def __init__(self, view):
+        self._view = view
+        self._position = 0
+
+    def write(self, data):
+        end = self._position + len(data)
+        self._view[self._position:end] = data
+        self._position = end
+        return len(data)
+
+
+#
+# Parallel ranged download of an Azure file into a memory-mapped local file.
+#
+# The destination is pre-sized to the length of the Azure file. Only the ranges reported by
+# ShareFileClient.get_ranges are fetched, so holes in sparse files are left as zeros without
+# being transferred. Each range is downloaded by a worker directly into a mapping of just
+# that range of the file, which is flushed and unmapped once the range is written, so at most
+# max_workers ranges are mapped at any time and peak memory use does not grow with the file
+# size; the download benchmark case records it as peak_rss_mb.
+# Ranges are retried and cancelled as by ParallelFileUploader.
+#
+class ParallelFileDownloader():
+
+    # Input Arguments:
+    # chunk_size - size of each downloaded range
+    # max_workers - number of ranges downloaded concurrently
+    # max_retries - number of times a range failing with a transient error is retried before giving up
+    # retry_backoff - initial wait in seconds between retries, doubled on every attempt
+    # governor - ConcurrencyGovernor limiting the requests in flight, possibly shared with other transfers
+    def __init__(self, chunk_size=MAX_RANGE_SIZE, max_workers=8, max_retries=3, retry_backoff=0.5, governor=None):
+        if chunk_size <= 0:
+            raise ValueError('chunk_size must be greater than 0.')
+        if max_workers < 1:
+            raise ValueError('max_workers must be at least 1.')
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.governor = governor
+
+    # Downloads file_client to destination_path and returns the number of bytes transferred.
+    def download(self, file_client, destination_path):
+        size = file_client.get_file_properties()['size']
+
+        with open(destination_path, 'w+b') as destination_file:
+            destination_file.truncate(size)
+            if size == 0:
+                # A zero length file cannot be mapped
+                return 0
+
+            # Split every valid range reported by the service into chunks; holes are skipped
+            chunks = []
+            for file_range in file_client.get_ranges():
+                range_start = file_range['start']
+                range_end = min(file_range['end'] + 1, size)
+                for offset, length in split_ranges(range_end - range_start, self.chunk_size):
+                    chunks.append((range_start + offset, length))
+
+            fileno = destination_file.fileno()
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                transferred = _transfer_ranges(executor, lambda offset, length, stop:
+                                               self._download_range(file_client, fileno, offset, length, stop), chunks)
+
+        return transferred
+
+    def _download_range(self, file_client, fileno, offset, length, stop):
+        # Mappings must start at a multiple of the allocation granularity
+        start = offset - offset % mmap.ALLOCATIONGRANULARITY
+
+        def download():
+            mapped = mmap.mmap(fileno, offset - start + length, offset=start, access=mmap.ACCESS_WRITE)
+            try:
+                with memoryview(mapped) as mapped_view, mapped_view[offset - start:] as view:
+                    governed_call(self.governor, lambda: file_client.download_file(offset=offset, length=length)
+                                  .readinto(_MappedRangeWriter(view)))
+                mapped.flush()
+            finally:
+                mapped.close()
+
+        _with_retries(download, self.max_retries, self.retry_backoff, stop)
+        return length
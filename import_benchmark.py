@@ -0,0 +1,176 @@
+#-------------------------------------------------------------------------
+# Microsoft Developer & Platform Evangelism
+#
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# THIS CODE AND INFORMATION ARE PROVIDED "AS IS" WITHOUT WARRANTY OF ANY KIND,
+# EITHER EXPRESSED OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND/OR FITNESS FOR A PARTICULAR PURPOSE.
+#----------------------------------------------------------------------------------
+# The example companies, organizations, products, domain names,
+# e-mail addresses, logos, people, places, and events depicted
+# herein are fictitious. No association with any real company,
+# organization, product, domain name, email address, logo, person,
+# places, or events is intended or should be inferred.
+#--------------------------------------------------------------------------
+# Import-time benchmark of the entry points.
+#
+# Every module is imported in a fresh interpreter started with python -X importtime, after one
+# warm-up run that compiles the bytecode caches. The cumulative import time the interpreter
+# reports for the module is kept, the lowest of --repeat runs as the least noisy, together with
+# the wall time of the whole process. The report also lists the slowest imports below each module
+# by self time, and whether the module loaded the Azure SDK or requests, which none of the entry
+# points should do before a client is built:
+#   python import_benchmark.py --output imports.json
+#   python import_benchmark.py --baseline imports.json --tolerance 0.25 --max-ms 150
+# The JSON report is written to stdout or --output, and progress lines to stderr.
+# With --baseline the run exits with status 1 when a module imports slower than the baseline by
+# more than --tolerance and --min-regression-ms, or starts loading the SDK; with --max-ms when a
+# module imports slower than that budget.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Modules imported by the command line entry points
+DEFAULT_MODULES = [
+    'start',
+    'client_factory',
+    'file_basic_samples',
+    'file_advanced_samples',
+    'file_basic_samples_async',
+    'file_advanced_samples_async',
+    'file_sync',
+    'transfer_profiles',
+    'file_benchmarks',
+]
+
+# Top-level packages that should only be imported once a client is built
+DEFERRED_PACKAGES = ('azure', 'requests')
+
+
+# Returns the (name, depth, self_us, cumulative_us) entries of python -X importtime output.
+def parse_importtime(output):
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        name = fields[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), depth, int(fields[0]), int(fields[1])))
+    return entries
+
+
+# Imports module once in a fresh interpreter and returns its (entries, wall seconds).
+# Raises RuntimeError if the import fails.
+def run_import(module, python=sys.executable, cwd=None):
+    start = time.perf_counter()
+    process = subprocess.run([python, '-X', 'importtime', '-c', 'import ' + module],
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, cwd=cwd)
+    elapsed = time.perf_counter() - start
+    if process.returncode != 0:
+        raise RuntimeError('import ' + module + ' failed: ' + process.stderr.strip().splitlines()[-1])
+    return parse_importtime(process.stderr), elapsed
+
+
+# Returns the import time report of module over repeat runs as a dict.
+def measure_module(module, repeat=5, python=sys.executable, cwd=None, slowest=5):
+    run_import(module, python, cwd)
+    runs = [run_import(module, python, cwd) for _ in range(repeat)]
+    cumulative = []
+    for entries, _ in runs:
+        own = [entry for entry in entries if entry[0] == module and entry[1] == 0]
+        cumulative.append(own[-1][3] if own else 0)
+
+    fastest = min(range(repeat), key=lambda index: cumulative[index])
+    entries = runs[fastest][0]
+    loaded = set(entry[0].split('.')[0] for entry in entries)
+    return {
+        'module': module,
+        'ms': round(cumulative[fastest] / 1000.0, 2),
+        'median_ms': round(sorted(cumulative)[repeat // 2] / 1000.0, 2),
+        'wall_ms': round(min(elapsed for _, elapsed in runs) * 1000, 2),
+        'sdk_loaded': any(package in loaded for package in DEFERRED_PACKAGES),
+        'slowest': [[name, round(self_us / 1000.0, 2)]
+                    for name, _, self_us, _ in sorted(entries, key=lambda entry: -entry[2])[:slowest]],
+    }
+
+
+def run_benchmarks(options):
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    for module in options.modules:
+        result = measure_module(module, options.repeat, options.python, cwd)
+        results.append(result)
+        print('  {:<30} {:>8.2f} ms import {:>8.2f} ms process{}'.format(
+            module, result['ms'], result['wall_ms'], '  loads the SDK' if result['sdk_loaded'] else ''), file=sys.stderr)
+    return {
+        'config': {'python': options.python, 'version': sys.version.split()[0], 'repeat': options.repeat},
+        'results': results,
+    }
+
+
+# Returns a message for every module over the max_ms budget, slower than the baseline by more
+# than tolerance and min_ms, or loading the SDK while it did not in the baseline.
+def find_regressions(report, baseline, tolerance, min_ms=5.0, max_ms=None):
+    baseline_results = dict((result['module'], result) for result in (baseline or {}).get('results', []))
+    regressions = []
+    for result in report['results']:
+        if max_ms is not None and result['ms'] > max_ms:
+            regressions.append('{}: {} ms, budget {} ms'.format(result['module'], result['ms'], max_ms))
+        previous = baseline_results.get(result['module'])
+        if previous is None:
+            continue
+        if result['ms'] > previous['ms'] * (1 + tolerance) and result['ms'] - previous['ms'] > min_ms:
+            regressions.append('{}: {} ms, baseline {} ms'.format(result['module'], result['ms'], previous['ms']))
+        if result['sdk_loaded'] and not previous['sdk_loaded']:
+            regressions.append('{}: loads the SDK at import, the baseline did not'.format(result['module']))
+    return regressions
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description='Import-time benchmark of the Azure Files sample entry points.')
+    parser.add_argument('--modules', type=lambda value: value.split(','), default=DEFAULT_MODULES,
+                        help='comma separated modules to import, by default: ' + ', '.join(DEFAULT_MODULES))
+    parser.add_argument('--repeat', type=int, default=5, help='timed imports per module, the fastest is reported')
+    parser.add_argument('--python', default=sys.executable, help='interpreter to measure')
+    parser.add_argument('--output', help='write the JSON report to this file instead of stdout')
+    parser.add_argument('--baseline', help='JSON report to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed import time increase relative to the baseline')
+    parser.add_argument('--min-regression-ms', type=float, default=5.0,
+                        help='smallest increase over the baseline reported, so noise on fast imports does not fail')
+    parser.add_argument('--max-ms', type=float, help='import time budget of every module')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_arguments(argv)
+    if options.repeat < 1:
+        raise ValueError('--repeat must be at least 1.')
+    report = run_benchmarks(options)
+
+    if options.output:
+        with open(options.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+        print('Report written to ' + options.output, file=sys.stderr)
+    else:
+        print(json.dumps(report, indent=2))
+
+    baseline = None
+    if options.baseline:
+        with open(options.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+    regressions = find_regressions(report, baseline, options.tolerance, options.min_regression_ms, options.max_ms)
+    for regression in regressions:
+        print('REGRESSION ' + regression, file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,475 @@
+#-------------------------------------------------------------------------
+# Microsoft Developer & Platform Evangelism
+#
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# THIS CODE AND INFORMATION ARE PROVIDED "AS IS" WITHOUT WARRANTY OF ANY KIND,
+# EITHER EXPRESSED OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND/OR FITNESS FOR A PARTICULAR PURPOSE.
+#----------------------------------------------------------------------------------
+# The example companies, organizations, products, domain names,
+# e-mail addresses, logos, people, places, and events depicted
+# herein are fictitious. No association with any real company,
+# organization, product, domain name, email address, logo, person,
+# places, or events is intended or should be inferred.
+#--------------------------------------------------------------------------
+
+import bisect
+import json
+import threading
+import time
+from collections.abc import Awaitable
+
+#
+# Per-operation latency and throughput instrumentation for the Azure Files clients.
+#
+# instrument() wraps a service, share, directory or file client in a proxy that times every
+# storage call and records its wall time, bytes moved, retries and HTTP status into in-memory
+# histograms, one per operation name. Clients returned by the proxy are wrapped as well, so
+# instrumenting the service client covers everything derived from it. Status codes and
+# retries are observed through the raw_response_hook of the SDK, which is invoked for every
+# HTTP response, including the ones the retry policy retries.
+#
+# download_file only fetches the first chunk of a large file when it is called; the rest is
+# fetched as the returned downloader is read. Its call is therefore recorded once the content
+# has been read through readall, readinto, content_as_bytes, content_as_text or chunks, with the
+# time of the call and of the read, and the bytes actually read. A download that fails while
+# it is read is recorded as an error, and one that is never read is not recorded.
+#
+# The collected data is written out by exporters: JsonLinesExporter writes one JSON object
+# per operation and PrometheusExporter writes the Prometheus text exposition format.
+#
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Client methods that are timed by the proxy
+INSTRUMENTED_OPERATIONS = frozenset([
+    'create_share', 'delete_share', 'get_share_properties', 'set_share_metadata',
+    'list_shares', 'list_directories_and_files',
+    'create_directory', 'create_subdirectory', 'delete_directory', 'get_directory_properties', 'set_directory_metadata',
+    'create_file', 'upload_file', 'upload_range', 'download_file', 'get_ranges', 'clear_range', 'resize_file',
+    'delete_file', 'get_file_properties', 'set_file_metadata', 'start_copy_from_url', 'abort_copy',
+    'get_service_properties', 'set_service_properties',
+])
+
+# Operations that return a pager; every page fetched is timed as one call
+PAGED_OPERATIONS = frozenset(['list_shares', 'list_directories_and_files'])
+
+
+# Cumulative latency histogram with fixed bucket bounds.
+class Histogram():
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        # One extra bucket for values above the last bound
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    # Returns an estimate of the pct percentile: the upper bound of the bucket holding it,
+    # or the largest value observed for the bucket above the last bound.
+    def percentile(self, pct):
+        if not self.count:
+            return 0.0
+        rank = pct / 100.0 * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self.bounds[index] if index < len(self.bounds) else self.max
+        return self.max
+
+
+# Statistics of one operation name.
+class OperationStats():
+
+    def __init__(self, name):
+        self.name = name
+        self.latency = Histogram()
+        self.bytes = 0
+        self.errors = 0
+        self.retries = 0
+        self.statuses = {}
+
+
+# Thread-safe registry of OperationStats, filled by instrumented clients.
+class Instrumentation():
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._operations = {}
+
+    def record(self, operation, seconds, transferred=0, status=None, retries=0, error=False):
+        with self._lock:
+            stats = self._operations.get(operation)
+            if stats is None:
+                stats = self._operations[operation] = OperationStats(operation)
+            stats.latency.observe(seconds)
+            stats.bytes += transferred
+            stats.retries += retries
+            if error:
+                stats.errors += 1
+            status = str(status) if status is not None else 'unknown'
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+
+    # Returns the OperationStats of every operation, the slowest in total first.
+    def operations(self):
+        with self._lock:
+            return sorted(self._operations.values(), key=lambda stats: stats.latency.sum, reverse=True)
+
+    # Returns a printable table of the recorded operations.
+    def summary(self):
+        lines = ['{:<28} {:>7} {:>10} {:>10} {:>10} {:>12} {:>7} {:>7}'.format(
+            'operation', 'calls', 'total s', 'p50 ms', 'p99 ms', 'MB', 'retries', 'errors')]
+        for stats in self.operations():
+            lines.append('{:<28} {:>7} {:>10.3f} {:>10.1f} {:>10.1f} {:>12.2f} {:>7} {:>7}'.format(
+                stats.name, stats.latency.count, stats.latency.sum,
+                stats.latency.percentile(50) * 1000, stats.latency.percentile(99) * 1000,
+                stats.bytes / 1024.0 / 1024.0, stats.retries, stats.errors))
+        return '\n'.join(lines)
+
+
+# Writes one JSON object per operation, one per line.
+class JsonLinesExporter():
+
+    def export(self, instrumentation, stream):
+        for stats in instrumentation.operations():
+            stream.write(json.dumps({
+                'operation': stats.name,
+                'calls': stats.latency.count,
+                'seconds_total': round(stats.latency.sum, 6),
+                'p50_seconds': stats.latency.percentile(50),
+                'p99_seconds': stats.latency.percentile(99),
+                'bytes': stats.bytes,
+                'retries': stats.retries,
+                'errors': stats.errors,
+                'statuses': stats.statuses,
+            }) + '\n')
+
+
+# Writes the Prometheus text exposition format.
+class PrometheusExporter():
+
+    def __init__(self, prefix='azure_files'):
+        self.prefix = prefix
+
+    def export(self, instrumentation, stream):
+        operations = instrumentation.operations()
+        name = self.prefix + '_operation_duration_seconds'
+        stream.write('# HELP ' + name + ' Wall time of Azure Files client operations.\n')
+        stream.write('# TYPE ' + name + ' histogram\n')
+        for stats in operations:
+            cumulative = 0
+            for bound, bucket_count in zip(list(stats.latency.bounds) + ['+Inf'], stats.latency.counts):
+                cumulative += bucket_count
+                stream.write('{}_bucket{{operation="{}",le="{}"}} {}\n'.format(name, stats.name, bound, cumulative))
+            stream.write('{}_sum{{operation="{}"}} {}\n'.format(name, stats.name, stats.latency.sum))
+            stream.write('{}_count{{operation="{}"}} {}\n'.format(name, stats.name, stats.latency.count))
+
+        for metric, help_text, attribute in (
+                ('bytes_total', 'Bytes moved by Azure Files client operations.', 'bytes'),
+                ('retries_total', 'Retried attempts of Azure Files client operations.', 'retries'),
+                ('errors_total', 'Failed Azure Files client operations.', 'errors')):
+            stream.write('# HELP {}_{} {}\n# TYPE {}_{} counter\n'.format(self.prefix, metric, help_text, self.prefix, metric))
+            for stats in operations:
+                stream.write('{}_{}{{operation="{}"}} {}\n'.format(self.prefix, metric, stats.name, getattr(stats, attribute)))
+
+        stream.write('# HELP {0}_responses_total Responses by HTTP status.\n# TYPE {0}_responses_total counter\n'.format(self.prefix))
+        for stats in operations:
+            for status, count in sorted(stats.statuses.items()):
+                stream.write('{}_responses_total{{operation="{}",status="{}"}} {}\n'.format(self.prefix, stats.name, status, count))
+
+
+# Returns the number of bytes sent or received by a call, as far as it can be told.
+def _transferred_bytes(operation, args, kwargs, result):
+    if operation == 'upload_range':
+        length = kwargs.get('length', args[2] if len(args) > 2 else None)
+        if length is None:
+            length = len(kwargs.get('data', args[0] if args else b''))
+        return length
+    if operation == 'upload_file':
+        data = kwargs.get('data', args[0] if args else None)
+        if isinstance(data, (bytes, bytearray, str)):
+            return len(data)
+        return kwargs.get('length') or 0
+    return 0
+
+
+# HTTP statuses the storage retry policy retries
+RETRYABLE_STATUSES = frozenset([408, 500, 502, 503, 504])
+
+
+# Tracks the HTTP responses of one call through raw_response_hook.
+# A call can send several requests that are not retries, e.g. download_file fetching
+# chunks, so a retry is counted for every retryable status that was followed by another attempt.
+class _ResponseTracker():
+
+    def __init__(self, user_hook=None):
+        self.user_hook = user_hook
+        self.status = None
+        self.retryable_responses = 0
+
+    def __call__(self, response):
+        self.status = response.http_response.status_code
+        if self.status in RETRYABLE_STATUSES:
+            self.retryable_responses += 1
+        if self.user_hook:
+            self.user_hook(response)
+
+    def retries(self, failed):
+        if failed and self.status in RETRYABLE_STATUSES:
+            # The last retryable response ended the call instead of being retried
+            return max(0, self.retryable_responses - 1)
+        return self.retryable_responses
+
+
+# Proxy timing the calls of a client; see instrument().
+class InstrumentedClient():
+
+    def __init__(self, client, instrumentation):
+        self._client = client
+        self._instrumentation = instrumentation
+
+    def __getattr__(self, name):
+        attribute = getattr(self._client, name)
+        if not callable(attribute):
+            return attribute
+        if name in PAGED_OPERATIONS:
+            return lambda *args, **kwargs: self._page(name, attribute(*args, **kwargs))
+        if name in INSTRUMENTED_OPERATIONS:
+            return lambda *args, **kwargs: self._call(name, attribute, args, kwargs)
+        if name.startswith('get_') and name.endswith('_client'):
+            return lambda *args, **kwargs: instrument(attribute(*args, **kwargs), self._instrumentation)
+        return attribute
+
+    def _page(self, operation, pager):
+        if hasattr(pager, '__aiter__'):
+            # Pages of the aio clients are fetched by the caller's event loop and are not timed
+            return pager
+        return _InstrumentedPager(pager, operation, self._instrumentation)
+
+    def _call(self, operation, method, args, kwargs):
+        tracker = _ResponseTracker(kwargs.get('raw_response_hook'))
+        kwargs['raw_response_hook'] = tracker
+        start = time.perf_counter()
+        try:
+            result = method(*args, **kwargs)
+        except Exception as e:
+            self._record(operation, start, args, kwargs, None, tracker, e)
+            raise
+        # collections.abc is loaded with the interpreter, unlike inspect
+        if isinstance(result, Awaitable):
+            return self._await(operation, start, args, kwargs, result, tracker)
+        return self._completed(operation, start, args, kwargs, result, tracker)
+
+    async def _await(self, operation, start, args, kwargs, awaitable, tracker):
+        try:
+            result = await awaitable
+        except Exception as e:
+            self._record(operation, start, args, kwargs, None, tracker, e)
+            raise
+        return self._completed(operation, start, args, kwargs, result, tracker)
+
+    def _completed(self, operation, start, args, kwargs, result, tracker):
+        if operation == 'download_file':
+            # Recorded by the downloader once its content has been read
+            elapsed = time.perf_counter() - start
+
+            def finish(read_seconds, transferred, error):
+                self._record(operation, None, args, kwargs, None, tracker, error,
+                             elapsed=elapsed + read_seconds, transferred=transferred)
+            return _InstrumentedDownloader(result, finish)
+        self._record(operation, start, args, kwargs, result, tracker, None)
+        return instrument(result, self._instrumentation)
+
+    def _record(self, operation, start, args, kwargs, result, tracker, error, elapsed=None, transferred=None):
+        if error is not None:
+            status = getattr(error, 'status_code', None) or tracker.status or type(error).__name__
+        else:
+            status = tracker.status or 'ok'
+        if transferred is None:
+            transferred = 0 if error is not None else _transferred_bytes(operation, args, kwargs, result)
+        self._instrumentation.record(
+            operation,
+            time.perf_counter() - start if elapsed is None else elapsed,
+            transferred=transferred,
+            status=status,
+            retries=tracker.retries(error is not None),
+            error=error is not None)
+
+
+# Proxy for the downloader returned by download_file. The methods reading the content are timed,
+# and finish(read seconds, bytes read, error) is called when the first read completes or fails.
+# Reads and chunks of the aio downloader are awaited in the same way.
+class _InstrumentedDownloader():
+
+    def __init__(self, downloader, finish):
+        self._downloader = downloader
+        self._finish = finish
+        self._finished = False
+
+    def __getattr__(self, name):
+        return getattr(self._downloader, name)
+
+    def readall(self):
+        return self._read(self._downloader.readall, ())
+
+    def readinto(self, stream):
+        return self._read(self._downloader.readinto, (stream,))
+
+    def content_as_bytes(self, *args, **kwargs):
+        return self._read(self._downloader.content_as_bytes, args, kwargs)
+
+    def content_as_text(self, *args, **kwargs):
+        return self._read(self._downloader.content_as_text, args, kwargs)
+
+    def chunks(self):
+        chunks = self._downloader.chunks()
+        if hasattr(chunks, '__aiter__'):
+            return self._aiterate(chunks)
+        return self._iterate(chunks)
+
+    def _iterate(self, chunks):
+        start = time.perf_counter()
+        transferred = 0
+        try:
+            for chunk in chunks:
+                transferred += len(chunk)
+                yield chunk
+        except Exception as e:
+            self._done(start, 0, e)
+            raise
+        self._done(start, transferred, None)
+
+    async def _aiterate(self, chunks):
+        start = time.perf_counter()
+        transferred = 0
+        try:
+            async for chunk in chunks:
+                transferred += len(chunk)
+                yield chunk
+        except Exception as e:
+            self._done(start, 0, e)
+            raise
+        self._done(start, transferred, None)
+
+    def _read(self, method, args, kwargs=None):
+        start = time.perf_counter()
+        try:
+            result = method(*args, **(kwargs or {}))
+        except Exception as e:
+            self._done(start, 0, e)
+            raise
+        if isinstance(result, Awaitable):
+            return self._await(start, result)
+        self._done(start, self._size(), None)
+        return result
+
+    async def _await(self, start, awaitable):
+        try:
+            result = await awaitable
+        except Exception as e:
+            self._done(start, 0, e)
+            raise
+        self._done(start, self._size(), None)
+        return result
+
+    # A completed read has fetched the whole downloaded range
+    def _size(self):
+        return getattr(self._downloader, 'size', 0) or 0
+
+    def _done(self, start, transferred, error):
+        if not self._finished:
+            self._finished = True
+            self._finish(time.perf_counter() - start, transferred, error)
+
+
+# Proxy for the pager returned by a list operation; every page fetched is timed as one call.
+class _InstrumentedPager():
+
+    def __init__(self, pager, operation, instrumentation):
+        self._pager = pager
+        self._operation = operation
+        self._instrumentation = instrumentation
+
+    def __getattr__(self, name):
+        return getattr(self._pager, name)
+
+    def __iter__(self):
+        for page in self.by_page():
+            for item in page:
+                yield item
+
+    def by_page(self, *args, **kwargs):
+        return _InstrumentedPages(self._pager.by_page(*args, **kwargs), self._operation, self._instrumentation)
+
+
+# Proxy for the page iterator returned by by_page, which keeps its continuation_token reachable.
+class _InstrumentedPages():
+
+    def __init__(self, pages, operation, instrumentation):
+        self._pages = pages
+        self._operation = operation
+        self._instrumentation = instrumentation
+
+    def __getattr__(self, name):
+        return getattr(self._pages, name)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            page = next(self._pages)
+        except StopIteration:
+            raise
+        except Exception as e:
+            self._instrumentation.record(self._operation, time.perf_counter() - start,
+                                         status=getattr(e, 'status_code', None) or type(e).__name__, error=True)
+            raise
+        # The page is materialised so the time spent fetching it is attributed to this call
+        items = list(page)
+        self._instrumentation.record(self._operation, time.perf_counter() - start, status='ok')
+        return iter(items)
+
+
+# Returns client wrapped in an InstrumentedClient recording into instrumentation.
+# Values that are not Azure Files clients are returned unchanged.
+def instrument(client, instrumentation):
+    if client is None or isinstance(client, InstrumentedClient):
+        return client
+    if not type(client).__name__.endswith('Client'):
+        return client
+    return InstrumentedClient(client, instrumentation)
+
+
+_active = None
+
+
+# Turns on instrumentation for clients built by client_factory, and returns the registry.
+def enable_profiling():
+    global _active
+    if _active is None:
+        _active = Instrumentation()
+    return _active
+
+
+# Returns the active Instrumentation, or None if profiling is off.
+def get_active_instrumentation():
+    return _active
+
+
+# Returns client instrumented with the active Instrumentation, or unchanged if profiling is off.
+def instrument_if_enabled(client):
+    if _active is None:
+        return client
+    return instrument(client, _active)
@@ -0,0 +1,198 @@
+#-------------------------------------------------------------------------
+# Microsoft Developer & Platform Evangelism
+#
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# THIS CODE AND INFORMATION ARE PROVIDED "AS IS" WITHOUT WARRANTY OF ANY KIND,
+# EITHER EXPRESSED OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND/OR FITNESS FOR A PARTICULAR PURPOSE.
+#----------------------------------------------------------------------------------
+# The example companies, organizations, products, domain names,
+# e-mail addresses, logos, people, places, and events depicted
+# herein are fictitious. No association with any real company,
+# organization, product, domain name, email address, logo, person,
+# places, or events is intended or should be inferred.
+#--------------------------------------------------------------------------
+
+import threading
+import time
+from collections import OrderedDict
+
+# Client methods that change the properties of the object they are called on
+WRITE_METHODS = frozenset([
+    'create_share', 'delete_share', 'set_share_metadata', 'set_share_quota', 'set_share_properties',
+    'set_share_access_policy',
+    'create_directory', 'delete_directory', 'set_directory_metadata', 'set_http_headers',
+    'create_file', 'delete_file', 'upload_file', 'upload_range', 'upload_range_from_url', 'clear_range',
+    'resize_file', 'set_file_metadata', 'start_copy_from_url', 'abort_copy',
+])
+
+# Client methods returning the properties of the object they are called on
+READ_METHODS = frozenset(['get_share_properties', 'get_directory_properties', 'get_file_properties'])
+
+#
+# Read-through cache for share, directory and file properties (including metadata).
+#
+# Properties are served from memory for ttl seconds after they were fetched. Once an entry
+# expires it is revalidated: the properties are read again and their ETag and last-modified
+# time compared with the cached ones, and the counters record whether the object changed.
+# The Azure Files property reads do not honour If-None-Match, so this comparison is made on
+# the client. At most max_entries objects are kept, evicting the least recently used one.
+#
+# Writes invalidate the cached entry of their object only when the cache sees them: the
+# set_*_metadata methods below, and every method of WRITE_METHODS called on a client wrapped
+# with wrap(). A write made on the unwrapped client, or by another process, is only seen
+# once the entry expires, so ttl bounds how stale the properties can be.
+#
+class PropertiesCache():
+
+    # Input Arguments:
+    # ttl - seconds a cached entry is served without going to the service
+    # max_entries - number of objects kept before the least recently used one is evicted
+    # clock - function returning the current time in seconds, replaceable for testing
+    def __init__(self, ttl=30.0, max_entries=1024, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every invalidation, so a read racing with a write does not cache stale properties
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.changed = 0
+        self.evictions = 0
+
+    def get_share_properties(self, share_client):
+        return self._get(share_client, 'share', share_client.get_share_properties)
+
+    def get_directory_properties(self, directory_client):
+        return self._get(directory_client, 'directory', directory_client.get_directory_properties)
+
+    def get_file_properties(self, file_client):
+        return self._get(file_client, 'file', file_client.get_file_properties)
+
+    def set_share_metadata(self, share_client, metadata, **kwargs):
+        try:
+            return share_client.set_share_metadata(metadata, **kwargs)
+        finally:
+            self.invalidate(share_client)
+
+    def set_directory_metadata(self, directory_client, metadata, **kwargs):
+        try:
+            return directory_client.set_directory_metadata(metadata, **kwargs)
+        finally:
+            self.invalidate(directory_client)
+
+    def set_file_metadata(self, file_client, metadata, **kwargs):
+        try:
+            return file_client.set_file_metadata(metadata, **kwargs)
+        finally:
+            self.invalidate(file_client)
+
+    # Returns client wrapped in a CachedClient reading its properties through this cache.
+    def wrap(self, client):
+        if isinstance(client, CachedClient):
+            return client
+        return CachedClient(client, self)
+
+    # Drops the cached properties of client, to be called after writing to it by other means.
+    def invalidate(self, client):
+        with self._lock:
+            self._generation += 1
+            for kind in ('share', 'directory', 'file'):
+                self._entries.pop((kind, client.url), None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    # Returns the hit/miss counters as a dict.
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'revalidated': self.revalidated,
+                'changed': self.changed,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+            }
+
+    def _get(self, client, kind, fetch):
+        key = (kind, client.url)
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry[0]
+            generation = self._generation
+
+        properties = fetch()
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            elif self._same_version(entry[0], properties):
+                self.revalidated += 1
+            else:
+                self.changed += 1
+            if generation != self._generation:
+                return properties
+            self._entries[key] = (properties, self.clock() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return properties
+
+    def _same_version(self, cached, properties):
+        return (cached['etag'] == properties['etag']
+                and cached['last_modified'] == properties['last_modified'])
+
+
+#
+# Proxy of a share, directory or file client bound to a PropertiesCache.
+#
+# The READ_METHODS are served from the cache, the methods of WRITE_METHODS invalidate
+# the cached properties of the object once they return or fail, and the clients returned by the
+# other methods, such as get_file_client or create_directory, are wrapped as well. Everything
+# else is passed through to the wrapped client.
+#
+class CachedClient():
+
+    def __init__(self, client, cache):
+        self._client = client
+        self._cache = cache
+
+    def __getattr__(self, name):
+        attribute = getattr(self._client, name)
+        if not callable(attribute):
+            return attribute
+        if name in READ_METHODS:
+            def read(*args, **kwargs):
+                # Reads with options, such as a snapshot or a lease, bypass the cache
+                if args or kwargs:
+                    return attribute(*args, **kwargs)
+                return getattr(self._cache, name)(self._client)
+            return read
+        if name in WRITE_METHODS:
+            def write(*args, **kwargs):
+                try:
+                    return self._wrap_result(attribute(*args, **kwargs))
+                finally:
+                    self._cache.invalidate(self._client)
+            return write
+
+        def call(*args, **kwargs):
+            return self._wrap_result(attribute(*args, **kwargs))
+        return call
+
+    def _wrap_result(self, result):
+        if result is not None and type(result).__name__.endswith('Client') and hasattr(result, 'url'):
+            return self._cache.wrap(result)
+        return result
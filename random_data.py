@@ -1,8 +1,12 @@
 import random, string
-from random import randint
 
 # Gets random data to use in samples
 class RandomData:
+    # Input Arguments:
+    # seed - optional seed, the same seed always produces the same random bytes
+    def __init__(self, seed=None):
+        self.seed = seed
+
     # Gets random characters to use for generating unique name.
     def get_random_name(self, length):
         return ''.join(random.choice(string.ascii_lowercase) for i in range(length))
@@ -11,8 +15,23 @@ class RandomData:
     # Input Arguments:
     # size - size of random bytes to get
     def get_random_bytes(self, size):
-        rand = random.Random()
-        result = bytearray(size)
-        for i in range(size):
-            result[i] = rand.randint(0, 255)
-        return bytes(result)
\ No newline at end of file
+        # Generated in chunks because a single getrandbits call is limited to 2**31 bits
+        return b''.join(self.iter_random_chunks(size))
+
+    # Yields random bytes of a total size in chunks, so large payloads never sit fully in memory.
+    # Input Arguments:
+    # size - total size of random bytes to get
+    # chunk_size - size of each yielded chunk, the last one may be shorter
+    def iter_random_chunks(self, size, chunk_size=4 * 1024 * 1024):
+        rand = random.Random(self.seed)
+        for offset in range(0, size, chunk_size):
+            yield self._random_bytes(rand, min(chunk_size, size - offset))
+
+    # Generates the bytes in bulk rather than one randint call per byte.
+    def _random_bytes(self, rand, size):
+        if size <= 0:
+            return b''
+        if hasattr(rand, 'randbytes'):
+            # Python 3.9+
+            return rand.randbytes(size)
+        return rand.getrandbits(size * 8).to_bytes(size, 'little')
\ No newline at end of file
@@ -0,0 +1,130 @@
+#-------------------------------------------------------------------------
+# Microsoft Developer & Platform Evangelism
+#
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# THIS CODE AND INFORMATION ARE PROVIDED "AS IS" WITHOUT WARRANTY OF ANY KIND,
+# EITHER EXPRESSED OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND/OR FITNESS FOR A PARTICULAR PURPOSE.
+#----------------------------------------------------------------------------------
+# The example companies, organizations, products, domain names,
+# e-mail addresses, logos, people, places, and events depicted
+# herein are fictitious. No association with any real company,
+# organization, product, domain name, email address, logo, person,
+# places, or events is intended or should be inferred.
+#--------------------------------------------------------------------------
+
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+# Largest page the List Shares operation returns
+MAX_RESULTS_PER_PAGE = 5000
+
+
+# Compact record of a share returned by ShareLister, holding only the fields most
+# callers need instead of the full ShareProperties object.
+class ShareRecord():
+
+    __slots__ = ('name', 'last_modified', 'etag', 'quota', 'metadata')
+
+    def __init__(self, name, last_modified, etag, quota, metadata=None):
+        self.name = name
+        self.last_modified = last_modified
+        self.etag = etag
+        self.quota = quota
+        self.metadata = metadata
+
+    def __repr__(self):
+        return 'ShareRecord(name=' + repr(self.name) + ', quota=' + repr(self.quota) + ')'
+
+
+# One page of a share listing.
+# records - tuple of the ShareRecord objects on the page
+# continuation_token - token to pass back for the next page, or None after the last page
+SharePage = namedtuple('SharePage', ['records', 'continuation_token'])
+
+#
+# Lazy, paginated enumeration of the shares of an account.
+#
+# The name prefix is sent to the service with the List Shares request, so only matching
+# shares are transferred, and pages are requested one at a time as the caller consumes
+# them. get_page exposes the continuation tokens, so a caller can stop after a page and
+# resume from its token later. Each share is reduced to a ShareRecord with __slots__, and
+# metadata is only requested when include_metadata is set.
+#
+# With a cache_ttl, every page fetched is kept for that many seconds, keyed by account,
+# prefix and continuation token, so repeated enumerations within the TTL make no requests.
+# Shares created or deleted in the meantime are not seen until the page expires or
+# invalidate() is called.
+#
+class ShareLister():
+
+    # Input Arguments:
+    # results_per_page - number of shares requested per service call, at most MAX_RESULTS_PER_PAGE
+    # include_metadata - whether the records carry the metadata of the shares
+    # cache_ttl - seconds a fetched page is served from memory, 0 to disable the cache
+    # max_cached_pages - number of pages kept before the least recently used one is evicted
+    # clock - function returning the current time in seconds, replaceable for testing
+    def __init__(self, results_per_page=1000, include_metadata=False, cache_ttl=0, max_cached_pages=256, clock=time.monotonic):
+        if results_per_page < 1 or results_per_page > MAX_RESULTS_PER_PAGE:
+            raise ValueError('results_per_page must be between 1 and ' + str(MAX_RESULTS_PER_PAGE) + '.')
+        self.results_per_page = results_per_page
+        self.include_metadata = include_metadata
+        self.cache_ttl = cache_ttl
+        self.max_cached_pages = max_cached_pages
+        self.clock = clock
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # Yields a ShareRecord for every share whose name starts with name_starts_with, in name
+    # order, fetching the next page only once the previous one has been consumed.
+    def list_shares(self, service, name_starts_with=None, continuation_token=None):
+        while True:
+            page = self.get_page(service, name_starts_with, continuation_token)
+            for record in page.records:
+                yield record
+            continuation_token = page.continuation_token
+            if not continuation_token:
+                return
+
+    # Returns the SharePage starting at continuation_token, the first page if it is None.
+    def get_page(self, service, name_starts_with=None, continuation_token=None):
+        key = (service.url, name_starts_with or '', continuation_token)
+        if self.cache_ttl:
+            with self._lock:
+                entry = self._pages.get(key)
+                if entry is not None and entry[1] > self.clock():
+                    self.hits += 1
+                    self._pages.move_to_end(key)
+                    return entry[0]
+                self.misses += 1
+
+        listing = service.list_shares(name_starts_with=name_starts_with, include_metadata=self.include_metadata,
+                                      results_per_page=self.results_per_page)
+        pages = listing.by_page(continuation_token=continuation_token)
+        items = next(pages, ())
+        page = SharePage(tuple(self._to_record(share) for share in items), pages.continuation_token)
+
+        if self.cache_ttl:
+            with self._lock:
+                self._pages[key] = (page, self.clock() + self.cache_ttl)
+                self._pages.move_to_end(key)
+                while len(self._pages) > self.max_cached_pages:
+                    self._pages.popitem(last=False)
+        return page
+
+    # Drops the cached pages, of every account or only of service.
+    def invalidate(self, service=None):
+        with self._lock:
+            if service is None:
+                self._pages.clear()
+            else:
+                for key in [key for key in self._pages if key[0] == service.url]:
+                    del self._pages[key]
+
+    def _to_record(self, share):
+        return ShareRecord(share.name, share.last_modified, share.etag, share.quota,
+                           share.metadata if self.include_metadata else None)
@@ -25,22 +25,119 @@
 # 1. Create a Storage Account through the Azure Portal and provide your STORAGE_CONNECTION_STRING in the config.py file. See https://azure.microsoft.com/en-us/documentation/articles/storage-create-storage-account/ for more information.
 # 2. Set breakpoints and run the project. 
 #---------------------------------------------------------------------------
+# Launcher of the samples and tools. Each command imports only the modules it runs, and the
+# Azure SDK is loaded when the first client is built, so short-lived invocations start fast.
+#   python start.py [basic|advanced|all] [--async] [--transfer-profile NAME] [--profile]
+#   python start.py sync|profiles|benchmark|import-time ...
+#---------------------------------------------------------------------------
+import sys
+
 import config
-from file_basic_samples import FileBasicSamples
-from file_advanced_samples import FileAdvancedSamples
 
-print('Azure File Storage samples for Python')
+# Tools run by start.py: command -> (module, description). The module is imported only when
+# its command is chosen, and its main function is given the remaining arguments.
+TOOLS = {
+    'sync': ('file_sync', 'mirror a local directory tree into a file share, or back'),
+    'profiles': ('transfer_profiles', 'list the transfer profiles or autotune one'),
+    'benchmark': ('file_benchmarks', 'run the performance benchmarks'),
+    'import-time': ('import_benchmark', 'measure the import time of the entry points'),
+}
+
+
+def parse_arguments(argv):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Azure File Storage samples for Python',
+        epilog='Other commands, each with its own --help: ' +
+               '; '.join(name + ' - ' + description for name, (_, description) in sorted(TOOLS.items())))
+    parser.add_argument('samples', nargs='?', choices=['all', 'basic', 'advanced'], default='all',
+                        help='samples to run, all by default')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='run the asyncio samples built on azure.storage.fileshare.aio')
+    parser.add_argument('--transfer-profile', metavar='NAME',
+                        help='transfer profile setting chunk size, concurrency and connection pool, '
+                             'TRANSFER_PROFILE of config.py by default (see transfer_profiles.py)')
+    parser.add_argument('--profile', action='store_true',
+                        help='time every storage call and print a per-operation summary at the end')
+    parser.add_argument('--profile-format', choices=['jsonl', 'prometheus'], default='jsonl',
+                        help='format of the file written by --profile-output')
+    parser.add_argument('--profile-output', metavar='FILE',
+                        help='also export the --profile measurements to FILE')
+    return parser.parse_args(argv)
+
+
+# The sync samples take their transfer parameters from the active transfer profile
+def run_samples(names, connection_string):
+    for name in names:
+        print ('---------------------------------------------------------------')
+        if name == 'basic':
+            from file_basic_samples import FileBasicSamples
+            print('Azure Storage File samples')
+            FileBasicSamples().run_all_samples(connection_string)
+        else:
+            from file_advanced_samples import FileAdvancedSamples
+            print('Azure Storage Advanced File samples')
+            FileAdvancedSamples().run_all_samples(connection_string)
+
+
+async def run_async_samples(names, transfer_profile, connection_string):
+    for name in names:
+        print ('---------------------------------------------------------------')
+        if name == 'basic':
+            from file_basic_samples_async import FileBasicSamplesAsync
+            print('Azure Storage File samples (asyncio)')
+            await FileBasicSamplesAsync(max_concurrency=transfer_profile.max_concurrency,
+                                        chunk_size=transfer_profile.chunk_size).run_all_samples(connection_string)
+        else:
+            from file_advanced_samples_async import FileAdvancedSamplesAsync
+            print('Azure Storage Advanced File samples (asyncio)')
+            await FileAdvancedSamplesAsync(max_concurrency=transfer_profile.max_concurrency).run_all_samples(connection_string)
+
+
+def print_profile(args):
+    from instrumentation import get_active_instrumentation, JsonLinesExporter, PrometheusExporter
+
+    instrumentation = get_active_instrumentation()
+    print ('---------------------------------------------------------------')
+    print('Storage calls, slowest in total first')
+    print(instrumentation.summary())
+
+    if args.profile_output:
+        exporter = PrometheusExporter() if args.profile_format == 'prometheus' else JsonLinesExporter()
+        with open(args.profile_output, 'w') as stream:
+            exporter.export(instrumentation, stream)
+        print('Profile written to ' + args.profile_output)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in TOOLS:
+        import importlib
+        return importlib.import_module(TOOLS[argv[0]][0]).main(argv[1:]) or 0
+
+    args = parse_arguments(argv)
+    print('Azure File Storage samples for Python')
+
+    if args.profile or args.profile_output:
+        from instrumentation import enable_profiling
+        enable_profiling()
+
+    from transfer_profiles import select_profile
+    transfer_profile = select_profile(args.transfer_profile)
+    print('Transfer profile: ' + transfer_profile.name)
+
+    names = ['basic', 'advanced'] if args.samples == 'all' else [args.samples]
+    if args.use_async:
+        import asyncio
+        asyncio.run(run_async_samples(names, transfer_profile, config.STORAGE_CONNECTION_STRING))
+    else:
+        run_samples(names, config.STORAGE_CONNECTION_STRING)
 
-storage_connection_string = config.STORAGE_CONNECTION_STRING
+    if args.profile or args.profile_output:
+        print_profile(args)
+    return 0
 
-#Basic File samples
-print ('---------------------------------------------------------------')
-print('Azure Storage File samples')
-file_basic_samples = FileBasicSamples()
-file_basic_samples.run_all_samples(storage_connection_string)
 
-#Advanced File samples
-print ('---------------------------------------------------------------')
-print('Azure Storage Advanced Fileable samples')
-file_advanced_samples = FileAdvancedSamples()
-file_advanced_samples.run_all_samples(storage_connection_string)
\ No newline at end of file
+if __name__ == '__main__':
+    sys.exit(main())
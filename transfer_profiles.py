@@ -0,0 +1,288 @@
+#-------------------------------------------------------------------------
+# Microsoft Developer & Platform Evangelism
+#
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# THIS CODE AND INFORMATION ARE PROVIDED "AS IS" WITHOUT WARRANTY OF ANY KIND,
+# EITHER EXPRESSED OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND/OR FITNESS FOR A PARTICULAR PURPOSE.
+#----------------------------------------------------------------------------------
+# The example companies, organizations, products, domain names,
+# e-mail addresses, logos, people, places, and events depicted
+# herein are fictitious. No association with any real company,
+# organization, product, domain name, email address, logo, person,
+# places, or events is intended or should be inferred.
+#--------------------------------------------------------------------------
+# Named transfer profiles: the chunk size, concurrency and connection pool used by the
+# uploaders, downloaders and client factory of the samples.
+#
+# The profile is chosen, in order of precedence, by select_profile (start.py --transfer-profile),
+# the AZURE_FILE_TRANSFER_PROFILE environment variable or TRANSFER_PROFILE in config.py. Profiles
+# written by the autotune command are read from the JSON file named by the
+# AZURE_FILE_TRANSFER_PROFILE_FILE environment variable or TRANSFER_PROFILE_FILE in config.py.
+# AZURE_FILE_CHUNK_SIZE, AZURE_FILE_MAX_CONCURRENCY and AZURE_FILE_CONNECTION_POOL_SIZE override
+# single fields of the chosen profile.
+#
+# The autotune command sweeps chunk sizes and concurrencies with timed uploads and downloads,
+# against the in-process fake service or a storage account, and writes the fastest profile:
+#   python transfer_profiles.py autotune --connection-string "..." --output transfer_profiles.json
+#   python transfer_profiles.py list
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import namedtuple
+
+import config
+from file_transfer import MAX_RANGE_SIZE, ParallelFileDownloader, ParallelFileUploader
+
+MB = 1024 * 1024
+
+# Transfer parameters of a named profile.
+# name - name the profile is selected by
+# chunk_size - size of each range uploaded or downloaded, at most MAX_RANGE_SIZE
+# max_concurrency - number of ranges transferred concurrently
+# connection_pool_size - maximum number of connections kept open to the account
+TransferProfile = namedtuple('TransferProfile', ['name', 'chunk_size', 'max_concurrency', 'connection_pool_size'])
+
+# Built-in profiles. A transfer holds up to chunk_size * max_concurrency bytes in memory.
+PROFILES = {
+    'default': TransferProfile('default', MAX_RANGE_SIZE, 8, 32),
+    # Many small files: small ranges and many requests in flight to hide the per-call latency
+    'small-files': TransferProfile('small-files', 1 * MB, 32, 64),
+    # Few large files: the largest ranges, so fewer calls move the same bytes
+    'large-files': TransferProfile('large-files', MAX_RANGE_SIZE, 16, 32),
+    # At most 2 MiB of file data in memory per transfer
+    'low-memory': TransferProfile('low-memory', 1 * MB, 2, 4),
+}
+
+# Environment variables overriding single fields of the selected profile
+FIELD_VARIABLES = (
+    ('chunk_size', 'AZURE_FILE_CHUNK_SIZE'),
+    ('max_concurrency', 'AZURE_FILE_MAX_CONCURRENCY'),
+    ('connection_pool_size', 'AZURE_FILE_CONNECTION_POOL_SIZE'),
+)
+
+
+# Raises ValueError if a field of profile is out of range.
+def validate_profile(profile):
+    if profile.chunk_size <= 0 or profile.chunk_size > MAX_RANGE_SIZE:
+        raise ValueError('chunk_size of profile ' + profile.name + ' must be between 1 and ' + str(MAX_RANGE_SIZE) + ' bytes.')
+    if profile.max_concurrency < 1 or profile.connection_pool_size < 1:
+        raise ValueError('max_concurrency and connection_pool_size of profile ' + profile.name + ' must be at least 1.')
+    return profile
+
+
+# Returns the profiles of a JSON file mapping names to their fields, by name.
+def load_profile_file(path):
+    with open(path) as profile_file:
+        entries = json.load(profile_file)
+    return dict((name, validate_profile(TransferProfile(name, int(fields['chunk_size']), int(fields['max_concurrency']),
+                                                        int(fields['connection_pool_size']))))
+                for name, fields in entries.items())
+
+
+# Adds profile to the JSON profile file at path, replacing a profile of the same name.
+def write_profile_file(path, profile):
+    entries = {}
+    if os.path.exists(path):
+        with open(path) as profile_file:
+            entries = json.load(profile_file)
+    entries[profile.name] = dict((field, getattr(profile, field)) for field, _ in FIELD_VARIABLES)
+    with open(path, 'w') as profile_file:
+        json.dump(entries, profile_file, indent=2, sort_keys=True)
+
+
+# Returns the built-in profiles together with those of the configured profile file, by name.
+def available_profiles(environ=None):
+    environ = os.environ if environ is None else environ
+    profiles = dict(PROFILES)
+    path = environ.get('AZURE_FILE_TRANSFER_PROFILE_FILE') or getattr(config, 'TRANSFER_PROFILE_FILE', '')
+    if path:
+        profiles.update(load_profile_file(path))
+    return profiles
+
+
+# Returns the TransferProfile called name, or the configured one if name is None, with the
+# field overrides of the environment applied.
+def get_profile(name=None, environ=None):
+    environ = os.environ if environ is None else environ
+    name = name or environ.get('AZURE_FILE_TRANSFER_PROFILE') or getattr(config, 'TRANSFER_PROFILE', '') or 'default'
+    profiles = available_profiles(environ)
+    if name not in profiles:
+        raise ValueError('Unknown transfer profile ' + name + ', expected one of: ' + ', '.join(sorted(profiles)) + '.')
+
+    profile = profiles[name]
+    for field, variable in FIELD_VARIABLES:
+        value = environ.get(variable)
+        if value:
+            try:
+                profile = profile._replace(**{field: int(value)})
+            except ValueError:
+                raise ValueError(variable + ' must be an integer, got ' + repr(value) + '.')
+    return validate_profile(profile)
+
+
+_active = None
+
+
+# Makes the profile called name the one used by the samples, and returns it.
+def select_profile(name):
+    global _active
+    _active = get_profile(name)
+    return _active
+
+
+# Returns the selected profile, the configured one if select_profile was not called.
+def get_active_profile():
+    global _active
+    if _active is None:
+        _active = get_profile()
+    return _active
+
+
+# Returns a ParallelFileUploader with the chunk size and concurrency of profile, the active one by default.
+def create_uploader(profile=None, **kwargs):
+    profile = profile or get_active_profile()
+    return ParallelFileUploader(chunk_size=profile.chunk_size, max_workers=profile.max_concurrency, **kwargs)
+
+
+# Returns a ParallelFileDownloader with the chunk size and concurrency of profile, the active one by default.
+def create_downloader(profile=None, **kwargs):
+    profile = profile or get_active_profile()
+    return ParallelFileDownloader(chunk_size=profile.chunk_size, max_workers=profile.max_concurrency, **kwargs)
+
+
+# Measured throughput of one combination of the autotune sweep.
+# profile - the TransferProfile measured
+# upload_mb_per_s, download_mb_per_s - throughput of the uploads and downloads
+# mb_per_s - throughput of the uploads and downloads together
+AutotuneResult = namedtuple('AutotuneResult', ['profile', 'upload_mb_per_s', 'download_mb_per_s', 'mb_per_s'])
+
+
+# Times uploads and downloads of the local file at source_path through share_client for every
+# combination of chunk_sizes and concurrencies, and returns an AutotuneResult for each.
+def autotune(share_client, source_path, chunk_sizes, concurrencies, iterations=2, name='tuned'):
+    size = os.path.getsize(source_path)
+    destination_path = source_path + '.download'
+    results = []
+    try:
+        for chunk_size, max_concurrency in itertools.product(chunk_sizes, concurrencies):
+            profile = validate_profile(TransferProfile(name, chunk_size, max_concurrency, max_concurrency))
+            file_client = share_client.get_file_client('autotune_' + str(chunk_size) + '_' + str(max_concurrency))
+            uploader = create_uploader(profile)
+            downloader = create_downloader(profile)
+
+            upload_time = download_time = 0.0
+            for _ in range(iterations):
+                start = time.monotonic()
+                uploader.upload(file_client, source_path)
+                upload_time += time.monotonic() - start
+                start = time.monotonic()
+                downloader.download(file_client, destination_path)
+                download_time += time.monotonic() - start
+            file_client.delete_file()
+
+            transferred = float(size) * iterations / MB
+            results.append(AutotuneResult(profile, round(transferred / upload_time, 2), round(transferred / download_time, 2),
+                                          round(2 * transferred / (upload_time + download_time), 2)))
+    finally:
+        if os.path.exists(destination_path):
+            os.remove(destination_path)
+    return results
+
+
+# Returns the profile to use from autotune results: among the results within tolerance of the
+# highest throughput, the one holding the least data in memory, then with the fewest connections.
+def best_profile(results, tolerance=0.05):
+    fastest = max(result.mb_per_s for result in results)
+    candidates = [result for result in results if result.mb_per_s >= fastest * (1 - tolerance)]
+    return min(candidates, key=lambda result: (result.profile.chunk_size * result.profile.max_concurrency,
+                                               result.profile.max_concurrency)).profile
+
+
+def _sizes(value):
+    return [int(float(size) * MB) for size in value.split(',')]
+
+
+def _counts(value):
+    return [int(count) for count in value.split(',')]
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description='Transfer profiles of the Azure Files samples.')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+    commands.add_parser('list', help='print the available profiles and the selected one')
+
+    tune = commands.add_parser('autotune', help='measure chunk sizes and concurrencies and write the fastest profile')
+    tune.add_argument('--connection-string', help='tune against this storage account instead of the in-process fake')
+    tune.add_argument('--latency-ms', type=float, default=20.0, help='simulated latency of every fake service call')
+    tune.add_argument('--bandwidth-mbps', type=float, default=400, help='simulated bandwidth of a single fake call, 0 for unlimited')
+    tune.add_argument('--link-mbps', type=float, default=1000, help='simulated bandwidth shared by all the fake calls, 0 for unlimited')
+    tune.add_argument('--size-mb', type=float, default=32, help='size of the file transferred')
+    tune.add_argument('--iterations', type=int, default=2, help='uploads and downloads timed per combination')
+    tune.add_argument('--chunk-sizes-mb', type=_sizes, default=_sizes('0.5,1,2,4'), help='comma separated chunk sizes to try, in MiB')
+    tune.add_argument('--concurrency', type=_counts, default=_counts('1,2,4,8,16,32'), help='comma separated concurrencies to try')
+    tune.add_argument('--tolerance', type=float, default=0.05,
+                      help='throughput drop accepted for a profile holding less data in memory')
+    tune.add_argument('--name', default='tuned', help='name of the profile written')
+    tune.add_argument('--output', default='transfer_profiles.json', help='JSON profile file the profile is added to')
+    return parser.parse_args(argv)
+
+
+def _create_service(options):
+    if options.connection_string:
+        from client_factory import get_client_factory
+        pool_size = max(options.concurrency)
+        return get_client_factory(options.connection_string, connection_pool_size=pool_size).get_service_client()
+    from fake_file_service import FakeShareServiceClient
+    return FakeShareServiceClient(latency=options.latency_ms / 1000.0,
+                                  bandwidth=options.bandwidth_mbps * MB / 8 if options.bandwidth_mbps else None,
+                                  link_bandwidth=options.link_mbps * MB / 8 if options.link_mbps else None)
+
+
+def main(argv=None):
+    options = parse_arguments(argv)
+    if options.command == 'list':
+        active = get_active_profile()
+        for name, profile in sorted(available_profiles().items()):
+            print('{} {:<14} chunk {:>5.2f} MiB  concurrency {:>3}  pool {:>3}'.format(
+                '*' if name == active.name else ' ', name, float(profile.chunk_size) / MB, profile.max_concurrency,
+                profile.connection_pool_size))
+        return 0
+
+    from random_data import RandomData
+
+    service = _create_service(options)
+    share_name = 'autotune' + RandomData().get_random_name(8)
+    share_client = service.create_share(share_name=share_name)
+    source_file = tempfile.NamedTemporaryFile(delete=False)
+    try:
+        with source_file:
+            for chunk in RandomData().iter_random_chunks(int(options.size_mb * MB)):
+                source_file.write(chunk)
+        results = autotune(share_client, source_file.name, options.chunk_sizes_mb, options.concurrency,
+                           options.iterations, options.name)
+    finally:
+        os.remove(source_file.name)
+        service.delete_share(share_name)
+
+    for result in results:
+        print('  chunk {:>5.2f} MiB  concurrency {:>3}  upload {:>8.1f} MB/s  download {:>8.1f} MB/s'.format(
+            float(result.profile.chunk_size) / MB, result.profile.max_concurrency, result.upload_mb_per_s, result.download_mb_per_s))
+    profile = best_profile(results, options.tolerance)
+    write_profile_file(options.output, profile)
+    print('Profile ' + profile.name + ' written to ' + options.output + ': chunk ' + str(profile.chunk_size) +
+          ' bytes, concurrency ' + str(profile.max_concurrency) + ', connection pool ' + str(profile.connection_pool_size))
+    print('Select it with TRANSFER_PROFILE_FILE and TRANSFER_PROFILE in config.py, or with the '
+          'AZURE_FILE_TRANSFER_PROFILE_FILE and AZURE_FILE_TRANSFER_PROFILE environment variables.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())